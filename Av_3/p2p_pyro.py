@@ -5,9 +5,212 @@ import random
 import sys
 import os
 import base64
+import bisect
+import hashlib
+import itertools
+import json
+import tempfile
+from collections import Counter, deque
 
 TRACKER_HEARTBEAT_INTERVAL = 10
 NODE_TIMEOUT_RANGE = (15, 30)
+# Tamanho (bytes) de cada pedaco com hash proprio, que e tambem o pedido numa transferencia;
+# o maior pedaco que um peer aceita enviar
+CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# Tempo maximo (s) de cada chamada de transferencia antes de considerar a conexao perdida
+TRANSFER_TIMEOUT = 10
+# Tentativas de retomar uma transferencia interrompida e a espera (s) entre elas
+MAX_TENTATIVAS = 5
+ESPERA_RETOMADA = 1
+# Sufixo do arquivo temporario enquanto o download nao termina e do registro dos pedacos ja gravados
+SUFIXO_PARCIAL = ".parte"
+SUFIXO_PECAS = ".pecas"
+# Arquivo na pasta do peer com os hashes ja calculados; so sao refeitos quando o tamanho ou a data mudam
+ARQUIVO_HASHES = ".hashes.json"
+# Pedacos baixados ao mesmo tempo no modo enxame
+SWARM_WORKERS = 8
+# Vazao (bytes/s) suposta para um peer ainda nao medido: alta para que todos sejam experimentados
+VAZAO_INICIAL = 100 * 1024 * 1024
+# Peso da ultima medicao na media movel da vazao de cada peer
+PESO_VAZAO = 0.3
+# Maximo de nomes devolvidos por consulta de busca no tracker
+LIMITE_BUSCA = 100
+# Mudancas da lista de arquivos guardadas por cada peer; um tracker mais atrasado recebe a lista inteira
+MAX_MUDANCAS = 1000
+# Intervalo (s) entre as varreduras da pasta do peer
+INTERVALO_VIGIA = 2
+
+def paraBytes(dados):
+    # O serializador serpent do Pyro entrega bytes como {"data": ..., "encoding": "base64"}
+    if isinstance(dados, dict) and dados.get("encoding") == "base64":
+        return base64.b64decode(dados["data"])
+    return dados
+
+def digestPecas(pecas):
+    # O digest do arquivo e o hash da lista de hashes dos pedacos: quem recebe confere a lista
+    # contra o digest e cada pedaco contra a lista, sem precisar reler o arquivo inteiro
+    return hashlib.sha256("".join(pecas).encode()).hexdigest()
+
+def metadadosValidos(metadados):
+    tamanhoPedaco = metadados["tamanhoPedaco"]
+    if not 0 < tamanhoPedaco <= MAX_CHUNK_SIZE:
+        return False
+    return (len(metadados["pecas"]) == -(-metadados["tamanho"] // tamanhoPedaco)
+            and digestPecas(metadados["pecas"]) == metadados["digest"])
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def descartar(indice, chave, valor):
+    # Tira o valor do conjunto indice[chave], apagando a chave quando ele fica vazio; devolve se sobrou algo
+    valores = indice[chave]
+    valores.discard(valor)
+    if not valores:
+        del indice[chave]
+    return bool(valores)
+
+class IndiceArquivos:
+    # Indice invertido do tracker: nome ou digest -> peers que tem o arquivo. Cada peer manda so o
+    # que mudou desde a ultima versao que o tracker viu. A busca por prefixo usa a lista ordenada dos
+    # nomes e a busca por trecho usa os trigramas dos nomes, sem percorrer os arquivos de todos os peers.
+    def __init__(self):
+        self.lock = threading.Lock()
+        # peer -> {nome: digest} e a versao da lista do peer que esta no indice
+        self.arquivosPeers = {}
+        self.versoesPeers = {}
+        # (nome, digest) -> peers
+        self.peersPar = {}
+        self.digestsNome = {}
+        self.nomesDigest = {}
+        # As buscas nao diferenciam maiusculas: nome em minusculas -> nomes originais
+        self.nomesMinusculo = {}
+        self.ordenados = []
+        self.trigramas = {}
+
+    def versao(self, peer):
+        return self.versoesPeers.get(peer)
+
+    def aplicarPacote(self, peer, pacote):
+        # O pacote vem de Peer.mudancasDesde: mudancas a partir de uma versao base ou a lista inteira.
+        # Mudancas sobre outra base, ou de uma versao mais antiga que a do indice, sao ignoradas.
+        # Devolve a versao do peer que ficou no indice.
+        with self.lock:
+            atual = self.versoesPeers.get(peer)
+            if atual is not None and pacote["versao"] < atual:
+                return atual
+            if "arquivos" in pacote:
+                self.substituirArquivos(peer, pacote["arquivos"])
+            elif pacote["base"] == atual:
+                arquivos = self.arquivosPeers.setdefault(peer, {})
+                for _, nome, digest in pacote["mudancas"]:
+                    if nome in arquivos:
+                        self.removerPar(peer, nome, arquivos.pop(nome))
+                    if digest is not None:
+                        self.adicionarPar(peer, nome, digest)
+                        arquivos[nome] = digest
+            else:
+                return atual
+            self.versoesPeers[peer] = pacote["versao"]
+            return pacote["versao"]
+
+    def substituirArquivos(self, peer, arquivos):
+        anteriores = set(self.arquivosPeers.get(peer, {}).items())
+        atuais = set(arquivos.items())
+        for nome, digest in anteriores - atuais:
+            self.removerPar(peer, nome, digest)
+        for nome, digest in atuais - anteriores:
+            self.adicionarPar(peer, nome, digest)
+        self.arquivosPeers[peer] = dict(arquivos)
+
+    def removerPeer(self, peer):
+        with self.lock:
+            self.versoesPeers.pop(peer, None)
+            for nome, digest in self.arquivosPeers.pop(peer, {}).items():
+                self.removerPar(peer, nome, digest)
+
+    def manterPeers(self, peers):
+        # Tira do indice quem nao esta mais na rede
+        with self.lock:
+            sairam = [p for p in self.arquivosPeers if p not in peers]
+        for peer in sairam:
+            self.removerPeer(peer)
+
+    def adicionarPar(self, peer, nome, digest):
+        peers = self.peersPar.setdefault((nome, digest), set())
+        peers.add(peer)
+        if len(peers) > 1:
+            return
+        self.nomesDigest.setdefault(digest, set()).add(nome)
+        digests = self.digestsNome.setdefault(nome, set())
+        digests.add(digest)
+        if len(digests) > 1:
+            return
+        minusculo = nome.lower()
+        nomes = self.nomesMinusculo.setdefault(minusculo, set())
+        nomes.add(nome)
+        if len(nomes) > 1:
+            return
+        bisect.insort(self.ordenados, minusculo)
+        for trigrama in trigramas(minusculo):
+            self.trigramas.setdefault(trigrama, set()).add(minusculo)
+
+    def removerPar(self, peer, nome, digest):
+        if descartar(self.peersPar, (nome, digest), peer):
+            return
+        descartar(self.nomesDigest, digest, nome)
+        if descartar(self.digestsNome, nome, digest):
+            return
+        minusculo = nome.lower()
+        if descartar(self.nomesMinusculo, minusculo, nome):
+            return
+        del self.ordenados[bisect.bisect_left(self.ordenados, minusculo)]
+        for trigrama in trigramas(minusculo):
+            descartar(self.trigramas, trigrama, minusculo)
+
+    def procurar(self, chave):
+        with self.lock:
+            return self.encontrados(self.paresChave(chave))
+
+    def buscar(self, consultas, limite=LIMITE_BUSCA):
+        # Uma resposta por consulta [modo, texto]: modo "nome" (nome ou digest exato), "prefixo" ou "trecho"
+        with self.lock:
+            return [self.encontrados(self.paresConsulta(modo, texto, limite)) for modo, texto in consultas]
+
+    def paresChave(self, chave):
+        return ([(chave, digest) for digest in self.digestsNome.get(chave, ())]
+                + [(nome, chave) for nome in self.nomesDigest.get(chave, ())])
+
+    def paresConsulta(self, modo, texto, limite):
+        if modo == "nome":
+            return self.paresChave(texto)
+        texto = texto.lower()
+        if modo == "prefixo":
+            inicio = bisect.bisect_left(self.ordenados, texto)
+            minusculos = itertools.takewhile(lambda m: m.startswith(texto),
+                                             (self.ordenados[i] for i in range(inicio, len(self.ordenados))))
+        elif modo == "trecho" and len(texto) >= 3:
+            # Candidatos sao os nomes com todos os trigramas do texto, comecando pelo conjunto menor
+            conjuntos = sorted((self.trigramas.get(t, set()) for t in trigramas(texto)), key=len)
+            minusculos = sorted(m for m in conjuntos[0].intersection(*conjuntos[1:]) if texto in m)
+        elif modo == "trecho":
+            minusculos = (m for m in self.ordenados if texto in m)
+        else:
+            return []
+        pares = []
+        for minusculo in itertools.islice(minusculos, limite):
+            for nome in sorted(self.nomesMinusculo[minusculo]):
+                pares.extend((nome, digest) for digest in sorted(self.digestsNome[nome]))
+        return pares
+
+    def encontrados(self, pares):
+        # digest -> {"nome": ..., "peers": [...]}; os peers sao todos que tem o conteudo, com qualquer nome
+        resultado = {}
+        for nome, digest in pares:
+            if digest not in resultado:
+                peers = set().union(*(self.peersPar[(n, digest)] for n in self.nomesDigest[digest]))
+                resultado[digest] = {"nome": nome, "peers": sorted(peers)}
+        return resultado
 
 class Peer:
     def __init__(self, nome):
@@ -22,34 +225,237 @@ class Peer:
         self.epoca = 0
         self.peers = []
         self.jaVotou = False
-        self.arquivosPeers = {}
+        self.indice = IndiceArquivos()
         self.eleicaoRodando = False
         self.timeout = random.uniform(*NODE_TIMEOUT_RANGE)
+        # Vazao medida de cada peer nos downloads (media movel, bytes/s)
+        self.vazaoPeers = {}
 
         if not os.path.exists(self.pasta):
             print(f"Erro: o diretorio {self.pasta} nao existe.")
             sys.exit(1)
         
-        self.arquivos = os.listdir(self.pasta)
+        # Protege arquivos, hashes, nomesDigest e o historico de mudancas
+        self.lockArquivos = threading.Lock()
+        self.arquivos = self.listarPasta()
+        # Nome do arquivo -> digest, hashes dos pedacos, tamanho e data da ultima modificacao
+        self.hashes = {}
+        # Digest -> nomes dos arquivos com esse conteudo, para achar um arquivo pedido pelo digest
+        self.nomesDigest = {}
+        self.indexarArquivos()
+        # Cada mudanca na lista de arquivos ganha uma versao: [versao, nome, digest], com digest None
+        # para arquivo removido. A versao inicial vem do relogio, entao um peer reiniciado nunca repete
+        # uma versao que o tracker ja viu. versaoTracker e a ultima versao que o tracker confirmou.
+        self.versao = time.time_ns()
+        self.mudancas = deque(maxlen=MAX_MUDANCAS)
+        self.versaoTracker = None
+
+    def caminhoArquivo(self, nomeArquivo):
+        # So arquivos da propria pasta podem ser lidos ou gravados
+        return os.path.join(self.pasta, os.path.basename(nomeArquivo))
+
+    def listarPasta(self):
+        # Downloads incompletos ficam na pasta para serem retomados, mas nao sao compartilhados
+        return [arq for arq in os.listdir(self.pasta)
+                if os.path.isfile(self.caminhoArquivo(arq)) and arq != ARQUIVO_HASHES
+                and not arq.endswith((SUFIXO_PARCIAL, SUFIXO_PARCIAL + SUFIXO_PECAS))]
+
+    def registrarMudanca(self, nomeArquivo, digest):
+        # Chamado com lockArquivos
+        self.versao += 1
+        self.mudancas.append([self.versao, nomeArquivo, digest])
+
+    def verificarPasta(self):
+        # Compara a pasta com a lista compartilhada e registra cada diferenca como uma nova versao.
+        # Arquivos modificados ha menos de INTERVALO_VIGIA podem estar sendo copiados: ficam para a proxima.
+        # Os hashes sao calculados sem lockArquivos, para um arquivo grande nao travar mudancasDesde; a
+        # pasta e listada de novo na hora de registrar, porque pode ter mudado durante o calculo.
+        calculados = {}
+        for arq in self.listarPasta():
+            try:
+                if time.time() - os.path.getmtime(self.caminhoArquivo(arq)) < INTERVALO_VIGIA:
+                    continue
+                with self.lockArquivos:
+                    anterior = self.hashes.get(arq, {}).get("digest")
+                calculados[arq] = (anterior, *self.hashesArquivo(arq))
+            except FileNotFoundError:
+                continue
+        with self.lockArquivos:
+            versao = self.versao
+            atuais = self.listarPasta()
+            for arq in [arq for arq in self.arquivos if arq not in atuais]:
+                self.arquivos.remove(arq)
+                self.registrarMudanca(arq, None)
+            for arq in [arq for arq in self.hashes if arq not in atuais]:
+                self.esquecerHashes(arq)
+            for arq, (anterior, info, _) in calculados.items():
+                if arq not in atuais:
+                    continue
+                if arq not in self.arquivos:
+                    self.arquivos.append(arq)
+                    self.registrarMudanca(arq, info["digest"])
+                elif info["digest"] != anterior:
+                    self.registrarMudanca(arq, info["digest"])
+            if any(recalculado for _, _, recalculado in calculados.values()):
+                self.salvarHashes()
+            mudou = self.versao != versao
+        if mudou:
+            self.publicarMudancas()
+
+    def vigiarPasta(self):
+        while self.active:
+            # Um erro numa passada (pasta inacessivel, cache que nao pode ser gravado) nao para a vigia
+            try:
+                self.verificarPasta()
+            except Exception as e:
+                print(f"{self.nome} nao conseguiu verificar a pasta: {e}")
+            time.sleep(INTERVALO_VIGIA)
+
+    @Pyro5.api.expose
+    def mudancasDesde(self, versao):
+        # O que mudou na lista de arquivos depois da versao informada; se o historico guardado
+        # nao alcanca essa versao (ou ela e de antes de o peer reiniciar), a lista inteira
+        with self.lockArquivos:
+            base = self.mudancas[0][0] - 1 if self.mudancas else self.versao
+            if versao is not None and base <= versao <= self.versao:
+                return {"base": versao, "versao": self.versao,
+                        "mudancas": [m for m in self.mudancas if m[0] > versao]}
+            return {"versao": self.versao, "arquivos": self.listaArquivos()}
+
+    def publicarMudancas(self):
+        # Manda ao tracker so o que ele ainda nao viu
+        if self.isTracker:
+            self.indice.aplicarPacote(self.nome, self.mudancasDesde(self.indice.versao(self.nome)))
+            return
+        if not self.trackerUri:
+            return
+        try:
+            with Pyro5.api.Proxy(self.trackerUri) as trackerProxy:
+                pacote = self.mudancasDesde(self.versaoTracker)
+                versao = trackerProxy.receberMudancas(self.nome, self.uri, pacote)
+                if versao != pacote["versao"]:
+                    # O tracker estava em outra versao ou nao conhecia este peer: manda a partir do que ele tem
+                    versao = trackerProxy.receberMudancas(self.nome, self.uri, self.mudancasDesde(versao))
+                self.versaoTracker = versao
+        except Pyro5.errors.CommunicationError:
+            print(f"{self.nome} nao conseguiu atualizar o tracker com novos arquivos.")
+
+    def calcularHashes(self, nomeArquivo):
+        pecas = []
+        with open(self.caminhoArquivo(nomeArquivo), "rb") as f:
+            while True:
+                pedaco = f.read(CHUNK_SIZE)
+                if not pedaco:
+                    break
+                pecas.append(hashlib.sha256(pedaco).hexdigest())
+        return {"digest": digestPecas(pecas), "tamanhoPedaco": CHUNK_SIZE, "pecas": pecas}
+
+    def guardarHashes(self, nomeArquivo, info):
+        # Chamado com lockArquivos
+        self.esquecerHashes(nomeArquivo)
+        self.hashes[nomeArquivo] = info
+        self.nomesDigest.setdefault(info["digest"], set()).add(nomeArquivo)
+
+    def esquecerHashes(self, nomeArquivo):
+        # Chamado com lockArquivos
+        info = self.hashes.pop(nomeArquivo, None)
+        if info is not None:
+            descartar(self.nomesDigest, info["digest"], nomeArquivo)
+
+    def hashesArquivo(self, nomeArquivo):
+        # Hashes do arquivo, recalculados so se ele mudou desde o ultimo calculo; devolve tambem se recalculou.
+        # O calculo le o arquivo inteiro e roda fora de lockArquivos: so a consulta e a gravacao usam o lock
+        estado = os.stat(self.caminhoArquivo(nomeArquivo))
+        with self.lockArquivos:
+            info = self.hashes.get(nomeArquivo)
+        if (info and info["mtime"] == estado.st_mtime_ns and info["tamanho"] == estado.st_size
+                and info["tamanhoPedaco"] == CHUNK_SIZE):
+            return info, False
+        print(f"{self.nome} calculando os hashes de '{nomeArquivo}'")
+        info = dict(self.calcularHashes(nomeArquivo), tamanho=estado.st_size, mtime=estado.st_mtime_ns)
+        with self.lockArquivos:
+            self.guardarHashes(nomeArquivo, info)
+        return info, True
+
+    def indexarArquivos(self):
+        try:
+            with open(os.path.join(self.pasta, ARQUIVO_HASHES)) as f:
+                salvos = json.load(f)
+        except (FileNotFoundError, ValueError):
+            salvos = {}
+        with self.lockArquivos:
+            for arq, info in salvos.items():
+                if arq in self.arquivos:
+                    self.guardarHashes(arq, info)
+        for arq in self.arquivos:
+            self.hashesArquivo(arq)
+        with self.lockArquivos:
+            self.salvarHashes()
+
+    def salvarHashes(self):
+        # Chamado com lockArquivos. O temporario tem nome unico e termina em SUFIXO_PARCIAL, entao
+        # nao aparece na lista de arquivos compartilhados
+        cache = os.path.join(self.pasta, ARQUIVO_HASHES)
+        fd, temporario = tempfile.mkstemp(dir=self.pasta, prefix=ARQUIVO_HASHES, suffix=SUFIXO_PARCIAL)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.hashes, f)
+            os.replace(temporario, cache)
+        except OSError:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def listaArquivos(self):
+        # O que o tracker indexa: nome -> digest de cada arquivo compartilhado. Chamado com lockArquivos
+        return {arq: self.hashes[arq]["digest"] for arq in self.arquivos if arq in self.hashes}
+
+    def nomeLocal(self, chave):
+        # Um arquivo pode ser pedido pelo nome ou pelo digest do conteudo
+        with self.lockArquivos:
+            if chave in self.hashes:
+                return chave
+            nomes = self.nomesDigest.get(chave)
+            return min(nomes) if nomes else None
     
     @Pyro5.api.expose
-    def cadastrarArquivos(self, nomePeer, uriPeer, arquivos):
+    def receberMudancas(self, nomePeer, uriPeer, pacote):
+        # Devolve a versao da lista do peer que o tracker tem depois de aplicar o pacote
         if self.isTracker:
             self.peers[nomePeer] = uriPeer
-            self.arquivosPeers[nomePeer] = arquivos
-            #print(self.arquivosPeers)
+            return self.indice.aplicarPacote(nomePeer, pacote)
 
     @Pyro5.api.expose
-    def procurarArquivo(self, nomeArquivo):
+    def descadastrarPeer(self, nomePeer):
         if self.isTracker:
-            return [peer for peer, files in self.arquivosPeers.items() if nomeArquivo in files]
+            self.peers.pop(nomePeer, None)
+            self.indice.removerPeer(nomePeer)
+
+    @Pyro5.api.expose
+    def procurarArquivo(self, chave):
+        # Busca pelo nome ou pelo digest; conteudos diferentes com o mesmo nome vem separados:
+        # digest -> {"nome": ..., "peers": [...]}
+        if self.isTracker:
+            return self.indice.procurar(chave)
+
+    @Pyro5.api.expose
+    def buscarArquivos(self, consultas):
+        # Varias buscas numa chamada so, cada uma [modo, texto]; ver IndiceArquivos.buscar
+        if self.isTracker:
+            return self.indice.buscar(consultas)
 
     def solicitarArquivo(self, nomeArquivo):
         if self.trackerUri:
             try:
                 with Pyro5.api.Proxy(self.trackerUri) as trackerProxy:
-                    possuemArquivo = trackerProxy.procurarArquivo(nomeArquivo)
-                    if possuemArquivo:
+                    encontrados = trackerProxy.procurarArquivo(nomeArquivo)
+                    if encontrados:
+                        if len(encontrados) > 1:
+                            print(f"Ha {len(encontrados)} arquivos diferentes com o nome '{nomeArquivo}'; "
+                                  f"baixando o que esta com mais peers")
+                        digest, encontrado = max(encontrados.items(), key=lambda item: len(item[1]["peers"]))
+                        nomeArquivo = encontrado["nome"]
+                        possuemArquivo = encontrado["peers"]
                         print(f"{self.nome} encontrou o arquivo com: {possuemArquivo}")
 
                         with Pyro5.api.locate_ns() as ns:
@@ -61,22 +467,10 @@ class Peer:
                                     except Pyro5.errors.NamingError:
                                         print(f"Erro: Não foi possível localizar {peerNome} no servidor de nomes")
                         
-                        peerEscolhido = random.choice(possuemArquivo)
-                        uriPeerEscolhido = self.peers[peerEscolhido]
-                        with Pyro5.api.Proxy(uriPeerEscolhido) as peerProxy:
-                            dados = peerProxy.enviarArquivo(nomeArquivo)
-
-                            if isinstance(dados, dict) and "data" in dados and "encoding" in dados:
-                                if dados["encoding"] == "base64":
-                                    dados_decodificados = base64.b64decode(dados["data"])
-                                    with open(os.path.join(self.pasta, nomeArquivo), "wb") as f:
-                                        f.write(dados_decodificados)
-                                    print(f"{self.nome} recebeu o arquivo '{nomeArquivo}' com sucesso de {peerEscolhido}")
-                                    self.atualizarArquivos(nomeArquivo)
-                                else:
-                                    print(f"Codificação desconhecida: {dados['encoding']}")
-                            else:
-                                print(f"Dados inválidos recebidos de {peerEscolhido}")
+                        possuemArquivo = [p for p in possuemArquivo if p in self.peers]
+                        if self.baixarArquivo(possuemArquivo, nomeArquivo, digest):
+                            print(f"{self.nome} recebeu o arquivo '{nomeArquivo}' com sucesso de {possuemArquivo}")
+                            self.atualizarArquivos(nomeArquivo)
                                 
                     else:
                         print(f"Nenhum peer possui o arquivo desejado.")
@@ -84,43 +478,295 @@ class Peer:
             except Pyro5.errors.CommunicationError:
                 print(f"{self.nome} nao conseguiu se comunicar com o tracker.")
     
+    def buscarNaRede(self, texto):
+        # Prefixo e trecho do nome numa unica consulta ao tracker; os que comecam com o texto vem primeiro
+        if self.trackerUri:
+            try:
+                with Pyro5.api.Proxy(self.trackerUri) as trackerProxy:
+                    porPrefixo, porTrecho = trackerProxy.buscarArquivos([["prefixo", texto], ["trecho", texto]])
+            except Pyro5.errors.CommunicationError:
+                print(f"{self.nome} nao conseguiu se comunicar com o tracker.")
+                return
+            encontrados = {**porPrefixo, **porTrecho}
+            if not encontrados:
+                print("Nenhum arquivo encontrado.")
+            for digest, encontrado in encontrados.items():
+                print(f"- {encontrado['nome']} ({digest[:12]}): {len(encontrado['peers'])} peers")
+
+    def sairDaRede(self):
+        if self.trackerUri and not self.isTracker:
+            try:
+                with Pyro5.api.Proxy(self.trackerUri) as trackerProxy:
+                    trackerProxy.descadastrarPeer(self.nome)
+            except Pyro5.errors.CommunicationError:
+                print(f"{self.nome} nao conseguiu avisar o tracker da saida.")
+
+    @Pyro5.api.expose
+    def metadadosArquivo(self, chave):
+        # Tamanho, digest e hashes dos pedacos do arquivo pedido pelo nome ou pelo digest
+        nomeArquivo = self.nomeLocal(chave)
+        if nomeArquivo is None or not os.path.isfile(self.caminhoArquivo(nomeArquivo)):
+            print(f"{self.nome} nao possui o arquivo '{chave}'")
+            return None
+        info, recalculou = self.hashesArquivo(nomeArquivo)
+        if recalculou:
+            with self.lockArquivos:
+                self.salvarHashes()
+        print(f"{self.nome} esta enviando o arquivo '{nomeArquivo}'")
+        return {campo: valor for campo, valor in info.items() if campo != "mtime"}
+
     @Pyro5.api.expose
-    def enviarArquivo(self, nomeArquivo):
-        arquivo = os.path.join(self.pasta, nomeArquivo)
-        if os.path.exists(arquivo):
-            print(f"{self.nome} esta enviando o arquivo '{nomeArquivo}'")
+    def enviarPedaco(self, chave, offset, tamanho):
+        # Le so o trecho pedido: a memoria usada nao depende do tamanho do arquivo
+        nomeArquivo = self.nomeLocal(chave) or chave
+        try:
+            with open(self.caminhoArquivo(nomeArquivo), "rb") as f:
+                f.seek(offset)
+                return f.read(min(tamanho, MAX_CHUNK_SIZE))
+        except FileNotFoundError:
+            print(f"{self.nome} nao encontrou o arquivo '{nomeArquivo}' para enviar.")
+            return None
+
+    def consultarMetadados(self, possuemArquivo, chave):
+        # Metadados do conteudo que a maioria dos peers tem e quem o confirmou; quem tem outro conteudo
+        # com o mesmo nome, ou manda hashes que nao batem com o digest, fica de fora
+        respostas = {}
+        for peerNome in possuemArquivo:
             try:
-                with open(arquivo, "rb") as f:
-                    return f.read()
-            except FileNotFoundError:
-                print(f"{self.nome} nao encontrou o arquivo '{nomeArquivo}' para enviar.")
+                with Pyro5.api.Proxy(self.peers[peerNome]) as peerProxy:
+                    peerProxy._pyroTimeout = TRANSFER_TIMEOUT
+                    metadados = peerProxy.metadadosArquivo(chave)
+                if metadados is not None and metadadosValidos(metadados):
+                    respostas[peerNome] = metadados
+            except Pyro5.errors.CommunicationError:
+                print(f"{self.nome} nao conseguiu consultar {peerNome}")
+        if not respostas:
+            return None, []
+        digest = Counter(m["digest"] for m in respostas.values()).most_common(1)[0][0]
+        confirmaram = [p for p in possuemArquivo if p in respostas and respostas[p]["digest"] == digest]
+        return respostas[confirmaram[0]], confirmaram
+
+    def lerRegistro(self, parcial, registro, cabecalho):
+        # Pedacos ja gravados (e conferidos) num download anterior do mesmo conteudo
+        if not (os.path.exists(parcial) and os.path.exists(registro)):
+            return set()
+        with open(registro) as f:
+            linhas = f.read().split()
+        if linhas[:2] != cabecalho.split():
+            return set()
+        return {int(peca) for peca in linhas[2:]}
+
+    def baixarArquivo(self, possuemArquivo, nomeArquivo, digest=None, trabalhadores=SWARM_WORKERS):
+        # Modo enxame: o arquivo e dividido nos pedacos que tem hash, baixados em paralelo de todos
+        # os peers que o possuem e gravados direto na sua posicao num arquivo temporario. Cada pedaco
+        # vai para o peer com maior vazao medida dividida pelos pedacos que ele ja esta enviando.
+        # Cada pedaco e conferido com o seu hash ao chegar; um pedaco corrompido e pedido de novo.
+        # Os pedacos prontos ficam num registro ao lado, para retomar o download depois de uma queda.
+        metadados, possuemArquivo = self.consultarMetadados(possuemArquivo, digest or nomeArquivo)
+        if metadados is None:
+            print(f"Nenhum peer conseguiu enviar o arquivo '{nomeArquivo}'")
+            return False
+        tamanho = metadados["tamanho"]
+        tamanhoPedaco = metadados["tamanhoPedaco"]
+        hashesPecas = metadados["pecas"]
+        destino = self.caminhoArquivo(nomeArquivo)
+        parcial = destino + SUFIXO_PARCIAL
+        registro = parcial + SUFIXO_PECAS
+        cabecalho = f"{metadados['digest']} {tamanhoPedaco}\n"
+        totalPecas = len(hashesPecas)
+        prontas = self.lerRegistro(parcial, registro, cabecalho)
+        if prontas:
+            print(f"{self.nome} retomando '{nomeArquivo}': {len(prontas)} de {totalPecas} pedacos ja baixados")
         else:
-            print(f"{self.nome} nao possui o arquivo '{nomeArquivo}'")
-            return None
+            with open(registro, "w") as f:
+                f.write(cabecalho)
+
+        pendentes = deque(peca for peca in range(totalPecas) if peca not in prontas)
+        # Pedacos em transito e os peers que estao enviando cada um
+        emTransito = {}
+        mudou = threading.Condition()
+        emUso = {p: 0 for p in possuemArquivo}
+        falhas = {p: 0 for p in possuemArquivo}
+        # Pedacos que nao bateram com o hash, por peer e por pedaco: o pedaco e pedido de novo a outro peer
+        # e quem manda pedacos corrompidos demais sai do download
+        corrompidos = Counter()
+        enviaramCorrompido = {}
+        recebidosPor = Counter()
+
+        def disponivel(p):
+            return falhas[p] <= MAX_TENTATIVAS and corrompidos[p] <= MAX_TENTATIVAS
+
+        def escolherPeer(excluir=()):
+            # Menor tempo estimado para entregar mais um pedaco: vazao medida dividida pela fila do peer
+            # Um peer ainda nao medido recebe um pedaco de cada vez ate a primeira medicao
+            candidatos = [p for p in possuemArquivo if disponivel(p) and p not in excluir
+                          and (p in self.vazaoPeers or emUso[p] == 0)]
+            if not candidatos:
+                return None
+            return max(candidatos, key=lambda p: self.vazaoPeers.get(p, VAZAO_INICIAL) / (emUso[p] + 1))
+
+        def proximaTarefa():
+            # Chamado com o lock. Um pedaco pendente ou, no fim do download, uma copia de um pedaco ainda
+            # em transito pedida a outro peer: o primeiro a chegar vale (endgame do BitTorrent)
+            if pendentes:
+                peca = pendentes[0]
+                # Se so resta quem ja mandou este pedaco corrompido, tenta de novo com ele
+                peerNome = escolherPeer(enviaramCorrompido.get(peca, ())) or escolherPeer()
+                if peerNome is None:
+                    return None, None
+                pendentes.popleft()
+            else:
+                copias = [(peca, peers) for peca, peers in emTransito.items()
+                          if len(peers) == 1 and peca not in prontas]
+                if not copias:
+                    return None, None
+                peca, peers = copias[0]
+                peerNome = escolherPeer(peers | enviaramCorrompido.get(peca, set()))
+                if peerNome is None:
+                    return None, None
+            emTransito.setdefault(peca, set()).add(peerNome)
+            emUso[peerNome] += 1
+            return peca, peerNome
+
+        def terminou():
+            return len(prontas) == totalPecas or not any(disponivel(p) for p in possuemArquivo)
+
+        def trabalhador(arquivo, reg):
+            proxies = {}
+            while True:
+                with mudou:
+                    peca = None
+                    while not terminou():
+                        peca, peerNome = proximaTarefa()
+                        if peca is not None:
+                            break
+                        mudou.wait(timeout=ESPERA_RETOMADA)
+                    if peca is None:
+                        break
+                    concorrentes = emUso[peerNome]
+                offset = peca * tamanhoPedaco
+                esperado = min(tamanhoPedaco, tamanho - offset)
+                inicio = time.time()
+                dados = None
+                valido = False
+                try:
+                    if peerNome not in proxies:
+                        proxies[peerNome] = Pyro5.api.Proxy(self.peers[peerNome])
+                        proxies[peerNome]._pyroTimeout = TRANSFER_TIMEOUT
+                    dados = paraBytes(proxies[peerNome].enviarPedaco(metadados["digest"], offset, esperado))
+                    valido = hashlib.sha256(dados).hexdigest() == hashesPecas[peca]
+                except Exception as e:
+                    # Qualquer erro da chamada (rede, excecao no peer, resposta invalida) e um pedaco que falhou
+                    if not isinstance(e, Pyro5.errors.CommunicationError):
+                        print(f"{self.nome} recebeu um erro de {peerNome} no pedaco {peca}: {e}")
+                    proxy = proxies.pop(peerNome, None)
+                    if proxy is not None:
+                        proxy._pyroRelease()
+                    dados = None
+                finally:
+                    # Mesmo se a thread morrer aqui, o pedaco sai de emTransito e o peer de emUso:
+                    # senao terminou() nunca veria o download acabar
+                    decorrido = max(time.time() - inicio, 1e-6)
+                    with mudou:
+                        emUso[peerNome] -= 1
+                        emTransito[peca].discard(peerNome)
+                        if not valido:
+                            if dados is None:
+                                falhas[peerNome] += 1
+                                desistiu = falhas[peerNome] == MAX_TENTATIVAS + 1
+                            else:
+                                print(f"{self.nome} recebeu o pedaco {peca} de '{nomeArquivo}' corrompido de {peerNome}")
+                                corrompidos[peerNome] += 1
+                                enviaramCorrompido.setdefault(peca, set()).add(peerNome)
+                                desistiu = corrompidos[peerNome] == MAX_TENTATIVAS + 1
+                            if desistiu:
+                                print(f"{self.nome} deixou de baixar '{nomeArquivo}' de {peerNome}")
+                            if peca not in prontas and not emTransito[peca]:
+                                del emTransito[peca]
+                                pendentes.append(peca)
+                        else:
+                            falhas[peerNome] = 0
+                            # Com varios pedacos na fila do peer, cada um leva mais: a vazao do peer e a soma
+                            vazao = esperado * concorrentes / decorrido
+                            anterior = self.vazaoPeers.get(peerNome)
+                            self.vazaoPeers[peerNome] = vazao if anterior is None else (
+                                PESO_VAZAO * vazao + (1 - PESO_VAZAO) * anterior)
+                            if not emTransito[peca]:
+                                del emTransito[peca]
+                            if peca not in prontas:
+                                try:
+                                    arquivo.seek(offset)
+                                    arquivo.write(dados)
+                                    arquivo.flush()
+                                    reg.write(f"{peca}\n")
+                                    reg.flush()
+                                except OSError:
+                                    # Sem conseguir gravar, o pedaco volta para a fila antes de a thread parar
+                                    if peca not in emTransito:
+                                        pendentes.append(peca)
+                                    mudou.notify_all()
+                                    raise
+                                prontas.add(peca)
+                                recebidosPor[peerNome] += 1
+                        mudou.notify_all()
+                if dados is None:
+                    time.sleep(ESPERA_RETOMADA)
+            for proxy in proxies.values():
+                proxy._pyroRelease()
+
+        with open(parcial, "r+b" if prontas else "w+b") as arquivo, open(registro, "a") as reg:
+            arquivo.truncate(tamanho)
+            threads = [threading.Thread(target=trabalhador, args=(arquivo, reg))
+                       for _ in range(min(trabalhadores, max(totalPecas, 1)))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        if len(prontas) < totalPecas:
+            print(f"{self.nome} nao conseguiu baixar '{nomeArquivo}': faltam {totalPecas - len(prontas)} pedacos")
+            return False
+        os.replace(parcial, destino)
+        os.remove(registro)
+        # O conteudo ja foi conferido pedaco a pedaco: os hashes recebidos valem para o arquivo gravado
+        with self.lockArquivos:
+            self.guardarHashes(os.path.basename(destino), dict(metadados, mtime=os.stat(destino).st_mtime_ns))
+            self.salvarHashes()
+        print(f"{self.nome} baixou '{nomeArquivo}' em {totalPecas} pedacos: {dict(recebidosPor)}")
+        return True
 
     def heartbeat(self):
         while self.isTracker and self.active:
             #print(f"peers para enviar heartbeat: {self.peers}")
-            for nome, peer_uri in self.peers.items():
+            # Copia: peers entram e saem por chamadas Pyro enquanto o heartbeat espera cada resposta
+            for nome, peer_uri in list(self.peers.items()):
                 if nome != self.nome:
                     try:
                         with Pyro5.api.Proxy(peer_uri) as peer:
                             print(f"enviando heartbeat para {nome}")
-                            peer.receberHeartbeat(self.trackerNome, self.trackerUri, self.epoca)
+                            conhecida = self.indice.versao(nome)
+                            versao = peer.receberHeartbeat(self.trackerNome, self.trackerUri, self.epoca, conhecida)
+                            # O peer responde com a versao da sua lista; o tracker pede so o que ainda nao viu
+                            # e confirma a versao que ficou no indice, para o peer publicar a partir dela
+                            if versao is not None and versao != conhecida:
+                                conhecida = self.indice.aplicarPacote(nome, peer.mudancasDesde(conhecida))
+                                peer.receberHeartbeat(self.trackerNome, self.trackerUri, self.epoca, conhecida)
                     except Pyro5.errors.CommunicationError:
                         print(f"{self.nome} nao conseguiu enviar heartbeat para {peer_uri}")
             
             time.sleep(TRACKER_HEARTBEAT_INTERVAL)
     
     @Pyro5.api.expose
-    def receberHeartbeat(self, trackerNome, trackerUri, trackerEpoca):
+    def receberHeartbeat(self, trackerNome, trackerUri, trackerEpoca, versaoConhecida=None):
+        # versaoConhecida e a versao da lista deste peer que o tracker tem no indice
         if trackerEpoca == self.epoca:
             self.lastHeartbeat = time.time()
+            self.versaoTracker = versaoConhecida
             print(f"{self.nome} recebeu heartbeat do tracker {trackerNome}")
         elif trackerEpoca > self.epoca:
             self.epoca = trackerEpoca
-            tracker = Pyro5.api.Proxy(f"PYRONAME:{trackerNome}")
-            tracker.cadastrarArquivos(self.nome, self.uri, self.arquivos)
+            # O novo tracker pede as mudancas de cada peer na resposta do heartbeat
+            self.versaoTracker = versaoConhecida
             self.jaVotou = False
             self.isTracker = False
             self.trackerNome = trackerNome
@@ -128,6 +774,9 @@ class Peer:
             self.peers[trackerNome] = trackerUri
             self.peers = {nome: uri for nome, uri in self.peers.items() if not (nome.startswith("Tracker_Epoca_") and nome != self.trackerNome)}
             self.lastHeartbeat = time.time()
+        else:
+            return None
+        return self.versao
 
     def verificarTracker(self):
         while self.active and not self.isTracker:
@@ -185,7 +834,7 @@ class Peer:
             primeiro_item = list(peer.peers.items())[0]
             del peer.peers[primeiro_item[0]]
 
-        for peerNome, peerUri in self.peers.items():
+        for peerNome, peerUri in list(self.peers.items()):
             if peerNome != self.nome:
                 try:
                     with Pyro5.api.Proxy(peerUri) as peerProxy:
@@ -203,7 +852,7 @@ class Peer:
             self.jaVotou = True
             print(f"{self.nome} iniciou uma eleicao para a epoca {self.epoca}")
             #print(f"peers ativos: {self.peers}")
-            for peerNome, peerUri in self.peers.items():
+            for peerNome, peerUri in list(self.peers.items()):
                 if peerNome != self.nome:
                     try:
                         with Pyro5.api.Proxy(peerUri) as peerProxy:
@@ -214,8 +863,8 @@ class Peer:
             
             if len(votos) > len(self.peers) // 2:
                 self.isTracker = True
-                self.arquivosPeers = {}
-                self.arquivosPeers[self.nome] = self.arquivos
+                # Um no que ja foi tracker aproveita o indice antigo: os peers so mandam o que mudou desde entao
+                self.indice.manterPeers(self.peers)
                 print(f"{self.nome} agora eh o tracker para a epoca {self.epoca}")
 
                 # registra novo tracker para a epoca no servidor de nomes
@@ -226,22 +875,21 @@ class Peer:
                     print(f"{self.trackerNome} registrado com URI {self.uri}")
 
                 self.peers[self.trackerNome] = self.peers.pop(self.nome)
-                self.arquivosPeers[self.trackerNome] = self.arquivosPeers.pop(self.nome)
                 self.nome = self.trackerNome
                 self.trackerUri = self.uri
+                self.publicarMudancas()
 
                 threading.Thread(target=self.heartbeat).start()
 
         self.eleicaoRodando = False
         
     def atualizarArquivos(self, novoArquivo):
-        self.arquivos.append(novoArquivo)
-        if self.trackerUri:
-            try:
-                with Pyro5.api.Proxy(self.trackerUri) as trackerProxy:
-                    trackerProxy.cadastrarArquivos(self.nome, self.uri, self.arquivos)
-            except Pyro5.errors.CommunicationError:
-                print(f"{self.nome} nao conseguiu atualizar o tracker com novos arquivos.")
+        # Um arquivo recem-baixado ja tem os hashes conferidos: entra na lista sem esperar a varredura da pasta
+        with self.lockArquivos:
+            if novoArquivo not in self.arquivos:
+                self.arquivos.append(novoArquivo)
+            self.registrarMudanca(novoArquivo, self.hashes[novoArquivo]["digest"])
+        self.publicarMudancas()
 
 if __name__ == "__main__":
     time.sleep(2)
@@ -258,7 +906,8 @@ if __name__ == "__main__":
             print("\nMenu:")
             print("1 - Mostrar arquivos locais")
             print("2 - Solicitar arquivo")
-            print("3 - Sair")
+            print("3 - Buscar arquivos na rede")
+            print("4 - Sair")
             opcao = input("Escolha uma opcao: ")
 
             if opcao == "1":
@@ -269,7 +918,11 @@ if __name__ == "__main__":
                 file_name = input("Digite o nome do arquivo: ")
                 peer.solicitarArquivo(file_name)
             elif opcao == "3":
+                texto = input("Digite o inicio ou um trecho do nome: ")
+                peer.buscarNaRede(texto)
+            elif opcao == "4":
                 print("Saindo...")
+                peer.sairDaRede()
                 peer.active = False
                 break
             else:
@@ -295,11 +948,13 @@ if __name__ == "__main__":
                 print(f"Encontrado: Nome = {nome}, URI = {uri}")
                 peer.trackerUri = uri
                 peer.trackerNome = nome
-                tracker = Pyro5.api.Proxy(f"PYRONAME:{peer.trackerNome}")
-                tracker.cadastrarArquivos(peer.nome, peer.uri, peer.arquivos)
+                peer.publicarMudancas()
                 peer.lastHeartbeat = time.time()
                 break
 
+        watcher_thread = threading.Thread(target=peer.vigiarPasta, daemon=True)
+        watcher_thread.start()
+
         tracker_thread = threading.Thread(target=peer.verificarTracker)
         tracker_thread.start()
 
@@ -0,0 +1,199 @@
+import asyncio
+import sys
+import time
+import grpc
+import replicacao_dados_pb2 as pb2
+import replicacao_dados_pb2_grpc as pb2_grpc
+from channels import CHANNEL_OPTIONS
+from cluster import (CLUSTER, LEADER_DISCOVERY_TIMEOUT, LEADER_RETRY_BACKOFF, leader_hint, next_leader_addr,
+                     refused_by_node)
+
+# Quantidade máxima de chamadas ao líder em trânsito por cliente
+MAX_IN_FLIGHT = 64
+# Limites de cada lote do BatchingSubmitter: número de escritas, bytes e espera (s)
+SUBMIT_MAX_ENTRIES = 128
+SUBMIT_MAX_BYTES = 256 * 1024
+SUBMIT_LINGER = 0.002
+
+class WriteError(Exception):
+    # A escrita não foi commitada; o Ack traz o status e o offset que ela tinha recebido
+    def __init__(self, ack):
+        super().__init__(f"offset {ack.offset}: {pb2.WriteStatus.Name(ack.status)} ({ack.message})")
+        self.ack = ack
+
+def check_ack(ack):
+    if ack.status != pb2.COMMITTED:
+        raise WriteError(ack)
+    return ack
+
+class AsyncLeaderClient:
+    # Cliente asyncio (grpc.aio): várias escritas ficam em trânsito ao mesmo tempo
+    # sobre um único canal por nó, limitadas por max_in_flight. Segue o líder como o
+    # LeaderConnection do client.py: dica do nó que recusou ou o próximo nó do cluster.
+    def __init__(self, addrs=None, max_in_flight=MAX_IN_FLIGHT, timeout=LEADER_DISCOVERY_TIMEOUT):
+        self.addrs = list(addrs or CLUSTER.values())
+        self.addr = self.addrs[0]
+        self.timeout = timeout
+        self.channels = {}
+        self.stubs = {}
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+
+    def stub(self, addr):
+        if addr not in self.stubs:
+            self.channels[addr] = grpc.aio.insecure_channel(addr, options=CHANNEL_OPTIONS)
+            self.stubs[addr] = pb2_grpc.LeaderServiceStub(self.channels[addr])
+        return self.stubs[addr]
+
+    async def call(self, method, request, idempotent=True):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        refusal = None
+        while True:
+            addr = self.addr
+            try:
+                return await getattr(self.stub(addr), method)(request)
+            except grpc.aio.AioRpcError as e:
+                if e.code() not in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.FAILED_PRECONDITION):
+                    raise
+                # Sem a recusa de um nó no ar, a escrita pode ter sido gravada antes da queda
+                if not idempotent and e.code() == grpc.StatusCode.UNAVAILABLE and not refused_by_node(e):
+                    raise
+                if e.code() == grpc.StatusCode.FAILED_PRECONDITION or refused_by_node(e):
+                    refusal = e
+                if loop.time() >= deadline:
+                    raise refusal or e
+                if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+                    # Líder recém-eleito ainda commitando as entradas herdadas: repete no mesmo nó
+                    await asyncio.sleep(LEADER_RETRY_BACKOFF)
+                    continue
+                hint = leader_hint(e)
+                # Só a primeira chamada que falhar neste nó muda o endereço; as outras já usam o novo
+                if self.addr == addr:
+                    self.addr = next_leader_addr(self.addrs, addr, hint)
+                if hint is None:
+                    await asyncio.sleep(LEADER_RETRY_BACKOFF)
+
+    def connected(self, addr):
+        channel = self.channels.get(addr)
+        return channel is not None and channel.get_state() == grpc.ChannelConnectivity.READY
+
+    async def call_write(self, method, request):
+        # Escritas não são idempotentes: só saem por um canal conectado, e sem conexão com o nó
+        # atual o líder é localizado antes com uma consulta, que pode ser repetida
+        if not self.connected(self.addr):
+            await self.call("QueryBatch", pb2.QueryBatchRequest())
+        return await self.call(method, request, idempotent=False)
+
+    async def write(self, content):
+        # Devolve o Ack da escrita commitada (com o offset atribuído) ou levanta WriteError
+        async with self.in_flight:
+            ack = await self.call_write("ReceiveData", pb2.Data(content=content))
+        return check_ack(ack)
+
+    def submit(self, content):
+        # Dispara a escrita sem esperar; o Future termina com o Ack
+        return asyncio.ensure_future(self.write(content))
+
+    async def write_batch(self, contents):
+        # Várias escritas numa única chamada; os Acks vêm na mesma ordem, sem checagem
+        async with self.in_flight:
+            response = await self.call_write("ReceiveDataBatch",
+                                             pb2.DataBatch(entries=[pb2.Data(content=c) for c in contents]))
+        return list(response.acks)
+
+    async def query(self, offset):
+        return await self.call("QueryData", pb2.QueryRequest(offset=offset))
+
+    async def close(self):
+        for channel in self.channels.values():
+            await channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class BatchingSubmitter:
+    # Junta as escritas em lotes do ReceiveDataBatch até encher o número de entradas
+    # ou de bytes, ou até a primeira escrita do lote esperar `linger` segundos.
+    # Cada submit devolve um Future com o Ack (e o offset) da sua escrita.
+    def __init__(self, client, max_entries=SUBMIT_MAX_ENTRIES, max_bytes=SUBMIT_MAX_BYTES, linger=SUBMIT_LINGER):
+        self.client = client
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.pending = []
+        self.pending_bytes = 0
+        self.flush_handle = None
+        self.tasks = set()
+
+    def submit(self, content):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((content, future))
+        self.pending_bytes += len(content.encode())
+        if len(self.pending) >= self.max_entries or self.pending_bytes >= self.max_bytes:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.linger, self.flush)
+        return future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = []
+        self.pending_bytes = 0
+        task = asyncio.ensure_future(self.send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send(self, batch):
+        try:
+            acks = await self.client.write_batch([content for content, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), ack in zip(batch, acks):
+            if future.done():
+                continue
+            if ack.status == pb2.COMMITTED:
+                future.set_result(ack)
+            else:
+                future.set_exception(WriteError(ack))
+
+    async def close(self):
+        # Envia o que sobrou e espera todos os lotes em trânsito
+        self.flush()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+async def main(writes=1000):
+    async with AsyncLeaderClient() as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client.submit(f"async {i}") for i in range(writes)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        failures = sum(isinstance(r, Exception) for r in results)
+        print(f"Pipelining: {writes} escritas em {elapsed:.2f}s ({writes / elapsed:.0f}/s), {failures} falhas")
+
+        submitter = BatchingSubmitter(client)
+        start = time.perf_counter()
+        futures = [submitter.submit(f"lote {i}") for i in range(writes)]
+        await submitter.close()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        failures = sum(isinstance(r, Exception) for r in results)
+        print(f"Em lotes: {writes} escritas em {elapsed:.2f}s ({writes / elapsed:.0f}/s), {failures} falhas")
+        if failures < writes:
+            last = max((r for r in results if not isinstance(r, Exception)), key=lambda ack: ack.offset)
+            # O Ack já diz onde a escrita ficou: a leitura vai direto ao offset
+            entry = await client.query(last.offset)
+            print(f"Último offset atribuído: {last.offset} (epoch {last.epoch}, commit até {last.commit_index}): "
+                  f"{entry.content}")
+
+if __name__ == "__main__":
+    asyncio.run(main(*[int(arg) for arg in sys.argv[1:2]]))
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import grpc
+import replicacao_dados_pb2 as pb2
+from benchmark_load import start_cluster, stop_cluster, HERE, REPLICAS
+from client import LeaderConnection
+from cluster import CLUSTER, PREFERRED_LEADER, node_port
+from database import STORAGE_PROFILE
+
+# Mede o tempo de failover: derruba o líder (SIGKILL) e conta o tempo até a próxima escrita
+# commitada pelo novo líder. A cada rodada o nó derrubado volta ao ar como seguidor.
+
+ROUNDS = 5
+# Escritas antes de cada queda, para o log não estar vazio
+WRITES_PER_ROUND = 50
+# Tempo (s) para o nó religado alcançar o líder antes da próxima rodada
+REJOIN_WAIT = 2.0
+WRITE_TIMEOUT = 1.0
+
+def node_command(node_id, mode):
+    if node_id == PREFERRED_LEADER:
+        return [sys.executable, os.path.join(HERE, "leader.py"), STORAGE_PROFILE, mode]
+    return [sys.executable, os.path.join(HERE, "replica.py"), node_id, node_port(node_id), STORAGE_PROFILE, mode]
+
+def commit_one(connection, content):
+    # Repete a escrita até ela ser commitada; devolve o número de tentativas que falharam
+    failures = 0
+    while True:
+        try:
+            ack = connection.ReceiveData(pb2.Data(content=content), timeout=WRITE_TIMEOUT)
+            if ack.status == pb2.COMMITTED:
+                return failures
+        except grpc.RpcError:
+            pass
+        failures += 1
+
+def main(rounds=ROUNDS, mode="threads"):
+    nodes = {addr: node_id for node_id, addr in CLUSTER.items()}
+    with tempfile.TemporaryDirectory() as workdir:
+        processes, _ = start_cluster(workdir, mode)
+        # start_cluster sobe as réplicas na ordem de REPLICAS e o nó preferido por último
+        by_node = dict(zip([replica_id for replica_id, _ in REPLICAS] + [PREFERRED_LEADER], processes))
+        connection = LeaderConnection()
+        times = []
+        try:
+            for round_number in range(rounds):
+                for i in range(WRITES_PER_ROUND):
+                    commit_one(connection, f"rodada {round_number} escrita {i}")
+                leader = nodes[connection.find()]
+                by_node[leader].kill()
+                by_node[leader].wait()
+                start = time.perf_counter()
+                failures = commit_one(connection, f"rodada {round_number} após a queda")
+                elapsed = (time.perf_counter() - start) * 1000
+                times.append(elapsed)
+                print(f"Rodada {round_number}: derrubado {leader}, novo líder {nodes[connection.addr]}, "
+                      f"failover em {elapsed:.0f} ms ({failures} tentativas falharam)")
+                by_node[leader] = subprocess.Popen(node_command(leader, mode), cwd=workdir,
+                                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                time.sleep(REJOIN_WAIT)
+        finally:
+            connection.close()
+            stop_cluster(by_node.values())
+    times.sort()
+    print(f"Failover: mínimo {times[0]:.0f} ms, mediana {times[len(times) // 2]:.0f} ms, máximo {times[-1]:.0f} ms")
+
+if __name__ == "__main__":
+    main(*([int(sys.argv[1])] if len(sys.argv) > 1 else []), *sys.argv[2:3])
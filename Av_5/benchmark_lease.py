@@ -0,0 +1,115 @@
+import signal
+import sys
+import tempfile
+import time
+import grpc
+import replicacao_dados_pb2 as pb2
+import replicacao_dados_pb2_grpc as pb2_grpc
+from benchmark_load import start_cluster, stop_cluster, REPLICAS
+from client import LeaderConnection
+from cluster import CLUSTER, PREFERRED_LEADER, LEASE_DURATION, LEASE_DRIFT_MARGIN, lease_window
+
+# Exercita o lease do líder pausando processos (SIGSTOP), como numa partição:
+#  1. pausa todos os outros nós e mede até quando o líder isolado ainda serve leituras fortes. Ele precisa
+#     parar antes de LEASE_DURATION, quando os outros voltam a votar; a sobra é a margem LEASE_DRIFT_MARGIN
+#     reservada para relógios que andam em ritmos diferentes.
+#  2. pausa o líder até outro ser eleito, escreve no novo líder e solta o antigo: a leitura forte no antigo
+#     não pode devolver o estado anterior à escrita.
+# Sai com código 1 se alguma das duas garantias falhar.
+
+ROUNDS = 3
+# Intervalo (s) entre as leituras feitas durante a pausa
+PROBE_INTERVAL = 0.002
+# Tempo máximo (s) de uma leitura e da espera pelo novo líder
+READ_TIMEOUT = 1.0
+ELECTION_WAIT = 5.0
+# Tempo (s) para o nó solto voltar a seguir o líder antes da próxima rodada
+REJOIN_WAIT = 1.0
+
+def read(stub, offset):
+    # QueryResponse, ou o código do erro se o nó recusou a leitura
+    try:
+        return stub.QueryData(pb2.QueryRequest(offset=offset), timeout=READ_TIMEOUT)
+    except grpc.RpcError as e:
+        return e.code()
+
+def isolated_leader_reads(leader_stub, others):
+    # Milissegundos, contados da pausa dos outros nós, até a última leitura servida pelo líder isolado
+    for process in others:
+        process.send_signal(signal.SIGSTOP)
+    start = time.monotonic()
+    last_served = 0.0
+    try:
+        while time.monotonic() - start < 2 * LEASE_DURATION:
+            if isinstance(read(leader_stub, 0), pb2.QueryResponse):
+                last_served = time.monotonic() - start
+            time.sleep(PROBE_INTERVAL)
+    finally:
+        for process in others:
+            process.send_signal(signal.SIGCONT)
+    return last_served * 1000
+
+def write_to_new_leader(addrs, content):
+    # Tenta os nós até um deles, eleito, commitar a escrita; o líder pausado não está na lista
+    stubs = [pb2_grpc.LeaderServiceStub(grpc.insecure_channel(addr)) for addr in addrs]
+    deadline = time.monotonic() + ELECTION_WAIT
+    while time.monotonic() < deadline:
+        for stub in stubs:
+            try:
+                ack = stub.ReceiveData(pb2.Data(content=content), timeout=READ_TIMEOUT)
+            except grpc.RpcError:
+                continue
+            if ack.status == pb2.COMMITTED:
+                return ack
+        time.sleep(PROBE_INTERVAL)
+    raise RuntimeError("nenhum outro nó foi eleito líder")
+
+def stale_read_after_failover(leader_process, leader_stub, other_addrs, content):
+    # True se o líder antigo, solto depois da eleição de outro, devolveu o estado anterior à escrita
+    leader_process.send_signal(signal.SIGSTOP)
+    try:
+        ack = write_to_new_leader(other_addrs, content)
+    finally:
+        leader_process.send_signal(signal.SIGCONT)
+    result = read(leader_stub, ack.offset)
+    return isinstance(result, pb2.QueryResponse) and result.content != content
+
+def main(rounds=ROUNDS, mode="threads"):
+    nodes = {addr: node_id for node_id, addr in CLUSTER.items()}
+    failures = 0
+    print(f"Lease de {LEASE_DURATION * 1000:.0f} ms, usado pelo líder por {lease_window() * 1000:.0f} ms "
+          f"(margem de {LEASE_DRIFT_MARGIN:.0%})")
+    with tempfile.TemporaryDirectory() as workdir:
+        processes, _ = start_cluster(workdir, mode)
+        # start_cluster sobe as réplicas na ordem de REPLICAS e o nó preferido por último
+        by_node = dict(zip([replica_id for replica_id, _ in REPLICAS] + [PREFERRED_LEADER], processes))
+        connection = LeaderConnection()
+        try:
+            for round_number in range(rounds):
+                connection.ReceiveData(pb2.Data(content=f"rodada {round_number}"))
+                leader_addr = connection.find()
+                leader = nodes[leader_addr]
+                leader_stub = pb2_grpc.LeaderServiceStub(grpc.insecure_channel(leader_addr))
+                others = [process for node_id, process in by_node.items() if node_id != leader]
+
+                served = isolated_leader_reads(leader_stub, others)
+                print(f"Rodada {round_number}: {leader} isolado serviu leituras até {served:.0f} ms "
+                      f"(folga de {LEASE_DURATION * 1000 - served:.0f} ms até os votos serem liberados)")
+                if served >= LEASE_DURATION * 1000:
+                    print("ERRO: o líder isolado serviu leituras depois do fim do lease nos outros nós")
+                    failures += 1
+                time.sleep(REJOIN_WAIT)
+
+                other_addrs = [addr for addr, node_id in nodes.items() if node_id != leader]
+                if stale_read_after_failover(by_node[leader], leader_stub, other_addrs, f"após {leader}"):
+                    print(f"ERRO: {leader} deposto devolveu uma leitura desatualizada")
+                    failures += 1
+                time.sleep(REJOIN_WAIT)
+        finally:
+            connection.close()
+            stop_cluster(by_node.values())
+    return failures
+
+if __name__ == "__main__":
+    failures = main(*([int(sys.argv[1])] if len(sys.argv) > 1 else []), *sys.argv[2:3])
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import grpc
+import replicacao_dados_pb2 as pb2
+import replicacao_dados_pb2_grpc as pb2_grpc
+from channels import SERVER_MODES
+from client import LeaderConnection
+from cluster import CLUSTER
+from database import STORAGE_PROFILE
+
+# Compara o líder e as réplicas nos modos de servidor (threads x grpc.aio) sob carga:
+# cada cliente simulado envia uma escrita por vez durante DURATION segundos.
+# Para cada modo sobe um cluster novo num diretório temporário.
+
+REPLICAS = [("r1", "50052"), ("r2", "50053"), ("r3", "50054")]
+# Tempo máximo (s) para o cluster subir e eleger o primeiro líder
+STARTUP_TIMEOUT = 15.0
+CLIENT_LEVELS = (10, 100, 1000)
+DURATION = 5.0
+# Clientes simulados que dividem um mesmo canal HTTP/2
+CLIENTS_PER_CHANNEL = 50
+REQUEST_TIMEOUT = 10.0
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def start_cluster(workdir, mode):
+    processes = [subprocess.Popen([sys.executable, os.path.join(HERE, "replica.py"), replica_id, port, STORAGE_PROFILE, mode],
+                                  cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for replica_id, port in REPLICAS]
+    processes.append(subprocess.Popen([sys.executable, os.path.join(HERE, "leader.py"), STORAGE_PROFILE, mode],
+                                      cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for addr in CLUSTER.values():
+        grpc.channel_ready_future(grpc.insecure_channel(addr)).result(timeout=STARTUP_TIMEOUT)
+    # Os clientes falam direto com o líder eleito
+    connection = LeaderConnection(timeout=STARTUP_TIMEOUT)
+    leader_addr = connection.find()
+    connection.close()
+    return processes, leader_addr
+
+def stop_cluster(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+async def client_loop(stub, client_id, deadline, latencies, failures):
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            ack = await stub.ReceiveData(pb2.Data(content=f"c{client_id}-{i}"), timeout=REQUEST_TIMEOUT)
+            if ack.status == pb2.COMMITTED:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures.append(ack.status)
+        except grpc.RpcError as e:
+            failures.append(e.code())
+        i += 1
+
+async def run_level(leader_addr, clients, duration):
+    channels = [grpc.aio.insecure_channel(leader_addr) for _ in range(-(-clients // CLIENTS_PER_CHANNEL))]
+    stubs = [pb2_grpc.LeaderServiceStub(channel) for channel in channels]
+    latencies, failures = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(stubs[i % len(stubs)], i, deadline, latencies, failures)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    for channel in channels:
+        await channel.close()
+    return len(latencies) / elapsed, sorted(latencies), len(failures)
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+def main(duration=DURATION, levels=CLIENT_LEVELS):
+    print(f"{'modo':<8} {'clientes':>8} {'escritas/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'falhas':>7}")
+    for mode in SERVER_MODES:
+        with tempfile.TemporaryDirectory() as workdir:
+            processes, leader_addr = start_cluster(workdir, mode)
+            try:
+                for clients in levels:
+                    throughput, latencies, failures = asyncio.run(run_level(leader_addr, clients, duration))
+                    print(f"{mode:<8} {clients:>8} {throughput:>11.0f} {percentile(latencies, 0.5):>9.1f} "
+                          f"{percentile(latencies, 0.99):>9.1f} {failures:>7}")
+            finally:
+                stop_cluster(processes)
+
+if __name__ == "__main__":
+    main(*([float(sys.argv[1])] if len(sys.argv) > 1 else []),
+         *([tuple(int(arg) for arg in sys.argv[2:])] if len(sys.argv) > 2 else []))
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent import futures
+from database import (init_db, insert_log, fetch_log_entry, check_query_plans, GroupCommitWriter,
+                      STORAGE_PROFILES, INSERT_SQL)
+
+# Compara escritas/s de cada perfil de armazenamento:
+#  - insert_log: um commit por linha (caminho antigo)
+#  - group commit: várias threads escrevendo pelo GroupCommitWriter
+# Depois confere os planos das consultas por offset e o tempo de busca conforme o log cresce;
+# se alguma consulta por offset varrer a tabela inteira, sai com código 1.
+
+def bench_insert_log(conn, rows):
+    start = time.perf_counter()
+    for offset in range(rows):
+        insert_log(conn, "1", offset, f"conteudo {offset}")
+    return rows / (time.perf_counter() - start)
+
+def bench_group_commit(conn, rows, threads):
+    writer = GroupCommitWriter(conn)
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = list(executor.map(lambda offset: writer.submit("1", offset, f"conteudo {offset}"), range(rows)))
+        for future in pending:
+            future.result()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return rows / elapsed
+
+def bench_lookups(sizes=(1000, 10000, 100000), lookups=2000):
+    print(f"\n{'linhas no log':>14} {'busca por offset (us)':>22}")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = init_db(os.path.join(tmp, "lookup.db"))
+        full_scans = check_query_plans(conn)
+        loaded = 0
+        for size in sizes:
+            conn.executemany(INSERT_SQL, ((str(1 + o // 1000), o, f"conteudo {o}") for o in range(loaded, size)))
+            conn.commit()
+            loaded = size
+            start = time.perf_counter()
+            for i in range(lookups):
+                fetch_log_entry(conn, (i * 7919) % size)
+            print(f"{size:>14} {(time.perf_counter() - start) / lookups * 1e6:>22.1f}")
+        conn.close()
+    for sql, plan in full_scans:
+        print(f"ERRO: consulta varre a tabela inteira: {sql} -> {plan}")
+    if not full_scans:
+        print("Planos de consulta OK: todas as buscas por offset usam índice.")
+    return full_scans
+
+def main(rows=2000, threads=16):
+    print(f"{'perfil':<12} {'insert_log (escritas/s)':>24} {'group commit (escritas/s)':>26}")
+    for profile in STORAGE_PROFILES:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = init_db(os.path.join(tmp, "single.db"), profile)
+            single = bench_insert_log(conn, rows)
+            conn.close()
+            conn = init_db(os.path.join(tmp, "group.db"), profile)
+            grouped = bench_group_commit(conn, rows, threads)
+            conn.close()
+        print(f"{profile:<12} {single:>24.0f} {grouped:>26.0f}")
+    return bench_lookups()
+
+if __name__ == "__main__":
+    # Uma consulta por offset sem índice faz o script sair com erro
+    full_scans = main(*[int(arg) for arg in sys.argv[1:3]])
+    sys.exit(1 if full_scans else 0)
@@ -0,0 +1,72 @@
+import grpc
+from threading import Lock
+
+# Keepalive e backoff de reconexão aplicados a todos os canais persistentes
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 100),
+    ("grpc.min_reconnect_backoff_ms", 100),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+]
+
+# O servidor precisa aceitar os pings de keepalive enviados pelos clientes
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 5000),
+    ("grpc.http2.max_ping_strikes", 0),
+]
+
+# Modos de servidor: gRPC síncrono com pool de threads ou grpc.aio (asyncio)
+SERVER_MODES = ("threads", "aio")
+SERVER_MODE = "threads"
+# Threads do servidor síncrono; no modo aio atendem só os handlers que não são corrotinas
+SERVER_WORKERS = 10
+
+class ChannelPool:
+    def __init__(self, addrs, stub_class, options=CHANNEL_OPTIONS):
+        self.stub_class = stub_class
+        self.options = options
+        self.lock = Lock()
+        self.channels = {}
+        self.stubs = {}
+        self.states = {}
+        for addr in addrs:
+            self.add(addr)
+
+    def add(self, addr):
+        with self.lock:
+            if addr in self.channels:
+                return
+            channel = grpc.insecure_channel(addr, options=self.options)
+            self.channels[addr] = channel
+            self.stubs[addr] = self.stub_class(channel)
+            self.states[addr] = grpc.ChannelConnectivity.IDLE
+        # Acompanha o estado da conexão; o gRPC reconecta sozinho respeitando o backoff
+        channel.subscribe(lambda state, addr=addr: self.on_state_change(addr, state), try_to_connect=True)
+
+    def on_state_change(self, addr, state):
+        previous = self.states.get(addr)
+        self.states[addr] = state
+        if previous == grpc.ChannelConnectivity.READY and state != grpc.ChannelConnectivity.READY:
+            print(f"[CANAL] Conexão com {addr} perdida ({state.name}), reconectando...")
+        elif state == grpc.ChannelConnectivity.READY and previous != grpc.ChannelConnectivity.READY:
+            print(f"[CANAL] Conectado a {addr}")
+
+    def stub(self, addr):
+        if addr not in self.stubs:
+            self.add(addr)
+        return self.stubs[addr]
+
+    def is_healthy(self, addr):
+        return self.states.get(addr) == grpc.ChannelConnectivity.READY
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels.values():
+                channel.close()
+            self.channels.clear()
+            self.stubs.clear()
+            self.states.clear()
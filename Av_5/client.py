@@ -1,30 +1,203 @@
+import time
 import grpc
+from threading import Lock
 import replicacao_dados_pb2 as pb2
 import replicacao_dados_pb2_grpc as pb2_grpc
+from channels import ChannelPool
+from cluster import (CLUSTER, LEADER_DISCOVERY_TIMEOUT, LEADER_RETRY_BACKOFF, leader_hint, next_leader_addr,
+                     refused_by_node)
 
-def menu():
+# Modos de leitura do ReadRouter
+READ_STRONG = "strong"
+READ_BOUNDED = "bounded"
+READ_ANY = "any"
+READ_MODES = [READ_STRONG, READ_BOUNDED, READ_ANY]
+# Tempo máximo (s) de uma leitura numa réplica antes de tentar a próxima
+READ_TIMEOUT = 1.0
+
+class LeaderConnection:
+    # Chamadas ao LeaderService de quem for o líder no momento. Um nó que não é o líder recusa
+    # com UNAVAILABLE e o endereço do líder que conhece; sem dica, tenta o próximo nó do cluster.
+    # Escritas não são idempotentes: só são reenviadas quando um nó no ar as recusou (com o metadado
+    # de dica), e só saem por um canal já conectado. Se a conexão cai no meio de uma escrita, ela pode
+    # ter sido gravada, e o erro vai para quem chamou decidir se repete.
+    # FAILED_PRECONDITION é o líder recém-eleito ainda commitando o que herdou: repete no mesmo nó.
+    def __init__(self, addrs=None, timeout=LEADER_DISCOVERY_TIMEOUT):
+        self.addrs = list(addrs or CLUSTER.values())
+        self.channels = ChannelPool(self.addrs, pb2_grpc.LeaderServiceStub)
+        self.addr = self.addrs[0]
+        self.timeout = timeout
+
+    def call(self, method, request, idempotent=True, **kwargs):
+        deadline = time.time() + self.timeout
+        refusal = None
+        while True:
+            addr = self.addr
+            try:
+                return getattr(self.channels.stub(addr), method)(request, **kwargs)
+            except grpc.RpcError as e:
+                if e.code() not in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.FAILED_PRECONDITION):
+                    raise
+                if not idempotent and e.code() == grpc.StatusCode.UNAVAILABLE and not refused_by_node(e):
+                    raise
+                if e.code() == grpc.StatusCode.FAILED_PRECONDITION or refused_by_node(e):
+                    refusal = e
+                if time.time() >= deadline:
+                    # O motivo da última recusa de um nó no ar diz mais que a conexão recusada do último tentado
+                    raise refusal or e
+                if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+                    time.sleep(LEADER_RETRY_BACKOFF)
+                    continue
+                hint = leader_hint(e)
+                self.addr = next_leader_addr(self.addrs, addr, hint)
+                if hint is None:
+                    time.sleep(LEADER_RETRY_BACKOFF)
+
+    def find(self):
+        # Endereço do líder atual (uma consulta vazia só para localizá-lo)
+        self.call("QueryBatch", pb2.QueryBatchRequest())
+        return self.addr
+
+    def write(self, method, request, **kwargs):
+        # Sem conexão com o nó atual, localiza o líder com uma consulta, que pode ser repetida à vontade
+        if not self.channels.is_healthy(self.addr):
+            self.find()
+        return self.call(method, request, idempotent=False, **kwargs)
+
+    def ReceiveData(self, request, **kwargs):
+        return self.write("ReceiveData", request, **kwargs)
+
+    def ReceiveDataBatch(self, request, **kwargs):
+        return self.write("ReceiveDataBatch", request, **kwargs)
+
+    def QueryData(self, request, **kwargs):
+        return self.call("QueryData", request, **kwargs)
+
+    def QueryBatch(self, request, **kwargs):
+        return self.call("QueryBatch", request, **kwargs)
+
+    def QueryRange(self, request, **kwargs):
+        # Stream: a procura pelo líder só vale para o início da chamada
+        return self.channels.stub(self.find()).QueryRange(request, **kwargs)
+
+    def close(self):
+        self.channels.close()
+
+class ReadRouter:
+    # Distribui as leituras entre as réplicas em rodízio:
+    #  - strong: sempre no líder
+    #  - bounded: numa réplica que já commitou até min_commit_index
+    #    (por padrão, o maior índice de commit que este cliente já viu)
+    #  - any: em qualquer réplica, mesmo atrasada
+    # Se nenhuma réplica atender, a leitura vai para o líder. Todo nó do cluster, inclusive o
+    # líder atual, atende o ReplicaService.
+    def __init__(self, leader=None, replica_addrs=None):
+        self.leader = leader or LeaderConnection()
+        self.replica_addrs = list(replica_addrs or CLUSTER.values())
+        self.replicas = ChannelPool(self.replica_addrs, pb2_grpc.ReplicaServiceStub)
+        self.lock = Lock()
+        self.turn = 0
+        self.last_commit_index = -1
+
+    def observe(self, commit_index):
+        with self.lock:
+            self.last_commit_index = max(self.last_commit_index, commit_index)
+
+    def replica_order(self):
+        with self.lock:
+            start = self.turn % len(self.replica_addrs)
+            self.turn += 1
+        ordered = self.replica_addrs[start:] + self.replica_addrs[:start]
+        # Réplicas com conexão ativa primeiro, mantendo o rodízio entre elas
+        return sorted(ordered, key=lambda addr: not self.replicas.is_healthy(addr))
+
+    def required_commit(self, mode, min_commit_index):
+        if mode == READ_ANY:
+            return -1
+        return self.last_commit_index if min_commit_index is None else min_commit_index
+
+    def targets(self, mode):
+        # Réplicas em rodízio (exceto na leitura forte) e, por último, o líder
+        if mode == READ_STRONG:
+            return [self.leader]
+        return [self.replicas.stub(addr) for addr in self.replica_order()] + [self.leader]
+
+    def query(self, offset, mode=READ_BOUNDED, min_commit_index=None):
+        request = pb2.QueryRequest(offset=offset, min_commit_index=self.required_commit(mode, min_commit_index))
+        for stub in self.targets(mode):
+            try:
+                response = stub.QueryData(request, timeout=None if stub is self.leader else READ_TIMEOUT)
+            except grpc.RpcError:
+                # Réplica fora do ar ou atrasada demais: tenta a próxima
+                if stub is self.leader:
+                    raise
+                continue
+            self.observe(response.commit_index)
+            return response
+
+    def query_many(self, offsets, mode=READ_BOUNDED, min_commit_index=None):
+        # Várias entradas numa única chamada, na ordem pedida; ausentes vêm com offset -1
+        request = pb2.QueryBatchRequest(offsets=offsets,
+                                        min_commit_index=self.required_commit(mode, min_commit_index))
+        for stub in self.targets(mode):
+            try:
+                response = stub.QueryBatch(request, timeout=None if stub is self.leader else READ_TIMEOUT)
+            except grpc.RpcError:
+                if stub is self.leader:
+                    raise
+                continue
+            self.observe(response.commit_index)
+            return list(response.entries)
+
+    def iter_range(self, from_offset=0, to_offset=-1, mode=READ_BOUNDED, min_commit_index=None):
+        # Gera as entradas commitadas de [from_offset, to_offset) em ordem (to_offset -1: até o fim).
+        # Se o nó cair no meio da leitura, continua do próximo offset em outro nó.
+        min_commit_index = self.required_commit(mode, min_commit_index)
+        for stub in self.targets(mode):
+            request = pb2.QueryRangeRequest(from_offset=from_offset, to_offset=to_offset,
+                                            min_commit_index=min_commit_index)
+            try:
+                for batch in stub.QueryRange(request):
+                    self.observe(batch.commit_index)
+                    for entry in batch.entries:
+                        yield entry
+                        from_offset = entry.offset + 1
+                return
+            except grpc.RpcError:
+                if stub is self.leader:
+                    raise
+
+    def close(self):
+        self.replicas.close()
+        self.leader.close()
+
+def menu(read_mode):
     print("\nCliente:")
     print("1. Enviar dado")
     print("2. Consultar dado por offset")
-    print("3. Sair")
+    print(f"3. Modo de leitura (atual: {read_mode})")
+    print("4. Sair")
 
 def main():
-    channel = grpc.insecure_channel("localhost:50051")
-    stub = pb2_grpc.LeaderServiceStub(channel)
+    stub = LeaderConnection()
+    router = ReadRouter(stub)
+    read_mode = READ_STRONG
 
     while True:
-        menu()
+        menu(read_mode)
         op = input("Escolha: ").strip()
         if op == "1":
             content = input("Digite o conteúdo: ")
             data = pb2.Data(epoch="1", offset=0, content=content)
             resp = stub.ReceiveData(data)
             print(f"Resposta: {resp.message}")
+            if resp.status == pb2.COMMITTED:
+                print(f"Offset: {resp.offset}, Epoch: {resp.epoch}, Commit até: {resp.commit_index}")
+                router.observe(resp.commit_index)
         elif op == "2":
             try:
                 offset = int(input("Offset: "))
-                req = pb2.QueryRequest(offset=offset)
-                res = stub.QueryData(req)
+                res = router.query(offset, read_mode)
                 if res.offset == -1:
                     print("Não encontrado.")
                 else:
@@ -32,6 +205,13 @@ def main():
             except:
                 print("Offset inválido.")
         elif op == "3":
+            mode = input(f"Modo ({', '.join(READ_MODES)}): ").strip()
+            if mode in READ_MODES:
+                read_mode = mode
+            else:
+                print("Modo inválido.")
+        elif op == "4":
+            router.close()
             break
         else:
             print("Opção inválida.")
@@ -0,0 +1,62 @@
+# Nós do cluster (id -> endereço). Todos atendem o ReplicaService; o nó eleito atende também o LeaderService
+CLUSTER = {
+    "leader": "localhost:50051",
+    "r1": "localhost:50052",
+    "r2": "localhost:50053",
+    "r3": "localhost:50054",
+}
+# Nó que começa a primeira eleição antes dos outros e, se estiver no ar, costuma ser o primeiro líder
+PREFERRED_LEADER = "leader"
+# Sem notícias do líder por um tempo sorteado nesse intervalo (s), o nó inicia uma eleição
+ELECTION_TIMEOUT_MIN = 0.15
+ELECTION_TIMEOUT_MAX = 0.30
+# Lease do líder (s): depois de ouvir o líder, um nó não vota em outro candidato por esse tempo.
+# O líder que ouviu a maioria pode então servir leituras linearizáveis sem consultar ninguém.
+# Não pode passar do ELECTION_TIMEOUT_MIN, senão os nós votariam antes do lease acabar.
+LEASE_DURATION = ELECTION_TIMEOUT_MIN
+# Fração do lease que o líder descarta para cobrir a diferença de velocidade entre os relógios
+LEASE_DRIFT_MARGIN = 0.1
+# Espera extra (s) dos outros nós antes da primeira eleição, para o preferido ter tempo de subir
+STARTUP_ELECTION_DELAY = 1.0
+# Metadado de erro com o endereço do líder atual, enviado por quem recebe uma chamada sem ser líder
+LEADER_HINT_KEY = "leader-addr"
+# Tempo máximo (s) que um cliente procura o líder antes de desistir de uma chamada
+LEADER_DISCOVERY_TIMEOUT = 5.0
+# Espera (s) antes de tentar outro nó quando ninguém indicou o líder (eleição em andamento)
+LEADER_RETRY_BACKOFF = 0.05
+
+def epoch_number(epoch):
+    # As epochs trafegam como texto; a comparação é numérica ("" conta como 0)
+    return int(epoch) if epoch else 0
+
+def lease_window():
+    # Parte do lease que o líder usa de fato, contada a partir do envio do AppendEntries confirmado
+    return LEASE_DURATION * (1 - LEASE_DRIFT_MARGIN)
+
+def check_lease_timing(heartbeat_interval):
+    if LEASE_DURATION > ELECTION_TIMEOUT_MIN:
+        raise ValueError(f"LEASE_DURATION ({LEASE_DURATION}s) maior que ELECTION_TIMEOUT_MIN ({ELECTION_TIMEOUT_MIN}s)")
+    if not 0 <= LEASE_DRIFT_MARGIN < 1:
+        raise ValueError(f"LEASE_DRIFT_MARGIN ({LEASE_DRIFT_MARGIN}) fora de [0, 1)")
+    if heartbeat_interval >= lease_window():
+        raise ValueError(f"Heartbeat a cada {heartbeat_interval}s não renova um lease de {lease_window():.3f}s")
+
+def node_port(node_id):
+    return CLUSTER[node_id].rsplit(":", 1)[1]
+
+def leader_hint(error):
+    # Endereço do líder enviado por um nó que recusou a chamada por não ser o líder, ou None
+    for key, value in error.trailing_metadata() or ():
+        if key == LEADER_HINT_KEY and value:
+            return value
+    return None
+
+def refused_by_node(error):
+    # Recusa de um nó no ar (traz o metadado de dica, mesmo vazio), e não uma falha de conexão
+    return any(key == LEADER_HINT_KEY for key, _ in error.trailing_metadata() or ())
+
+def next_leader_addr(addrs, failed_addr, hint):
+    # Segue a dica do nó que recusou; sem dica, passa para o próximo nó da lista
+    if hint and hint != failed_addr:
+        return hint
+    return addrs[(addrs.index(failed_addr) + 1) % len(addrs)] if failed_addr in addrs else addrs[0]
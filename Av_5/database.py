@@ -1,7 +1,81 @@
 import sqlite3
+import time
+from pathlib import Path
+from concurrent.futures import Future
+from threading import RLock, Condition, Thread
 
-def init_db(db_path):
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+# Group commit: grava até N linhas ou espera até T segundos antes do commit
+GROUP_COMMIT_MAX_ROWS = 256
+GROUP_COMMIT_MAX_DELAY = 0.005
+# Novas tentativas de um lote que falhou e a espera (s) antes de cada uma
+GROUP_COMMIT_RETRIES = 3
+GROUP_COMMIT_RETRY_BACKOFF = 0.05
+
+# Perfis de armazenamento: modo de journal, nível de synchronous, mmap e cache (KiB se negativo)
+STORAGE_PROFILES = {
+    "default": {"journal_mode": "DELETE", "synchronous": "FULL", "mmap_size": 0, "cache_size": -2000},
+    "wal_full": {"journal_mode": "WAL", "synchronous": "FULL", "mmap_size": 268435456, "cache_size": -65536},
+    "wal_normal": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268435456, "cache_size": -65536},
+    "wal_off": {"journal_mode": "WAL", "synchronous": "OFF", "mmap_size": 268435456, "cache_size": -65536},
+}
+# Padrão durável: cada commit faz fsync do WAL, então uma escrita confirmada ao cliente sobrevive à queda
+# da máquina. "wal_normal" pode perder os últimos commits numa queda de energia e só vale se escolhido.
+STORAGE_PROFILE = "wal_full"
+# Quantidade de statements preparados mantidos em cache por conexão
+STATEMENT_CACHE_SIZE = 256
+# Quantidade de offsets lidos por bloco nas consultas por intervalo
+RANGE_CHUNK_SIZE = 500
+# Offsets por consulta no multi-get esparso (abaixo do limite de parâmetros do SQLite)
+MULTI_GET_CHUNK_SIZE = 256
+
+# Os mesmos textos SQL são reutilizados para aproveitar o cache de statements do sqlite3
+INSERT_SQL = "INSERT OR IGNORE INTO log (epoch, offset, content) VALUES (?, ?, ?)"
+SELECT_BY_OFFSET_SQL = "SELECT epoch, offset, content FROM log WHERE offset = ?"
+SELECT_RANGE_SQL = "SELECT epoch, offset, content FROM log WHERE offset BETWEEN ? AND ? ORDER BY offset"
+# Sempre com MULTI_GET_CHUNK_SIZE parâmetros (o último bloco repete um offset) para reaproveitar o statement
+SELECT_IN_SQL = f"SELECT epoch, offset, content FROM log WHERE offset IN ({', '.join('?' * MULTI_GET_CHUNK_SIZE)})"
+MAX_OFFSET_SQL = "SELECT MAX(offset) FROM log"
+MIN_OFFSET_SQL = "SELECT MIN(offset) FROM log"
+LAST_ENTRY_SQL = "SELECT epoch, offset FROM log WHERE offset = (SELECT MAX(offset) FROM log)"
+# Primeiro e último offset de uma epoch: consultas separadas para cada uma ir direto à ponta do índice
+FIRST_OFFSET_IN_EPOCH_SQL = "SELECT MIN(offset) FROM log WHERE epoch = ?"
+LAST_OFFSET_IN_EPOCH_SQL = "SELECT MAX(offset) FROM log WHERE epoch = ?"
+TRUNCATE_SQL = "DELETE FROM log WHERE offset >= ?"
+COMPACT_SQL = "DELETE FROM log WHERE offset <= ?"
+
+# Migrações do esquema, aplicadas em ordem; PRAGMA user_version guarda a última aplicada
+SCHEMA_MIGRATIONS = [
+    # 1: a chave primária (epoch, offset) não serve para buscas só por offset
+    "CREATE INDEX IF NOT EXISTS idx_log_offset ON log(offset)",
+    # 2: estado da eleição (epoch atual e voto) que precisa sobreviver a um reinício
+    "CREATE TABLE IF NOT EXISTS node_state (key TEXT PRIMARY KEY, value TEXT)",
+]
+
+# Consultas por offset que precisam usar o índice (busca logarítmica, sem varrer a tabela)
+QUERY_PLAN_CHECKS = [
+    (SELECT_BY_OFFSET_SQL, (0,)),
+    (SELECT_RANGE_SQL, (0, 0)),
+    (SELECT_IN_SQL, (0,) * MULTI_GET_CHUNK_SIZE),
+    (MAX_OFFSET_SQL, ()),
+    (MIN_OFFSET_SQL, ()),
+    (LAST_ENTRY_SQL, ()),
+    (FIRST_OFFSET_IN_EPOCH_SQL, ("1",)),
+    (LAST_OFFSET_IN_EPOCH_SQL, ("1",)),
+    (TRUNCATE_SQL, (0,)),
+    (COMPACT_SQL, (0,)),
+]
+
+class LockedConnection(sqlite3.Connection):
+    # A mesma conexão é compartilhada pelas threads do servidor gRPC;
+    # o lock serializa as escritas para não abrir transações aninhadas
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = RLock()
+
+def init_db(db_path, profile=STORAGE_PROFILE):
+    conn = sqlite3.connect(db_path, check_same_thread=False, factory=LockedConnection,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    apply_profile(conn, profile)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS log (
@@ -11,19 +85,215 @@ def init_db(db_path):
             PRIMARY KEY (epoch, offset)
         )
     ''')
-    cursor.execute('DELETE FROM log')
     conn.commit()
+    migrate(conn)
     return conn
 
-def insert_log(conn, epoch, offset, content):
+def migrate(conn):
+    with conn.lock:
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, statement in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            print(f"[BANCO] Migração {number} aplicada")
+        conn.commit()
+
+def load_node_state(conn):
     cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR IGNORE INTO log (epoch, offset, content) VALUES (?, ?, ?)",
-        (epoch, offset, content)
-    )
-    conn.commit()
+    cursor.execute("SELECT key, value FROM node_state")
+    return dict(cursor.fetchall())
+
+def save_node_state(conn, **values):
+    # Gravado antes de responder um voto ou assumir uma epoch, como pede o Raft
+    with conn.lock:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT OR REPLACE INTO node_state (key, value) VALUES (?, ?)", values.items())
+        conn.commit()
+
+def open_read_only(conn):
+    # Segunda conexão, só de leitura, para o mesmo arquivo: não disputa o lock da conexão compartilhada
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+def check_query_plans(conn):
+    # Devolve as consultas cujo plano ainda varre a tabela inteira
+    cursor = conn.cursor()
+    full_scans = []
+    for sql, params in QUERY_PLAN_CHECKS:
+        plan = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        details = [row[3] for row in plan]
+        if not any("USING" in d and "INDEX" in d for d in details) or any(d.startswith("SCAN") for d in details):
+            full_scans.append((sql, details))
+    return full_scans
+
+def apply_profile(conn, profile):
+    settings = STORAGE_PROFILES[profile]
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    cursor.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    cursor.execute(f"PRAGMA mmap_size = {settings['mmap_size']}")
+    cursor.execute(f"PRAGMA cache_size = {settings['cache_size']}")
+
+def insert_log(conn, epoch, offset, content):
+    with conn.lock:
+        cursor = conn.cursor()
+        cursor.execute(INSERT_SQL, (epoch, offset, content))
+        conn.commit()
 
 def fetch_log_entry(conn, offset):
     cursor = conn.cursor()
-    cursor.execute("SELECT epoch, offset, content FROM log WHERE offset = ?", (offset,))
-    return cursor.fetchone()
\ No newline at end of file
+    cursor.execute(SELECT_BY_OFFSET_SQL, (offset,))
+    return cursor.fetchone()
+
+def fetch_log_range(conn, start_offset, end_offset):
+    cursor = conn.cursor()
+    cursor.execute(SELECT_RANGE_SQL, (start_offset, end_offset))
+    return cursor.fetchall()
+
+def iter_log_range(conn, start_offset, end_offset, chunk_size):
+    # Percorre [start_offset, end_offset] em blocos de até chunk_size offsets, um SELECT curto por bloco
+    while start_offset <= end_offset:
+        chunk_end = min(start_offset + chunk_size - 1, end_offset)
+        rows = fetch_log_range(conn, start_offset, chunk_end)
+        if rows:
+            yield rows
+        start_offset = chunk_end + 1
+
+def fetch_log_entries(conn, offsets):
+    # Multi-get em blocos de até MULTI_GET_CHUNK_SIZE offsets: um bloco denso vira uma varredura curta
+    # de [menor, maior] pelo índice; um esparso, uma busca por offset IN (...). Nenhuma leitura passa
+    # de 2 * MULTI_GET_CHUNK_SIZE linhas, por mais distantes que estejam os offsets pedidos.
+    wanted = sorted(set(offsets))
+    found = {}
+    cursor = conn.cursor()
+    for i in range(0, len(wanted), MULTI_GET_CHUNK_SIZE):
+        chunk = wanted[i:i + MULTI_GET_CHUNK_SIZE]
+        if chunk[-1] - chunk[0] < 2 * len(chunk):
+            chunk_set = set(chunk)
+            rows = [row for row in fetch_log_range(conn, chunk[0], chunk[-1]) if row[1] in chunk_set]
+        else:
+            padded = chunk + [chunk[-1]] * (MULTI_GET_CHUNK_SIZE - len(chunk))
+            rows = cursor.execute(SELECT_IN_SQL, padded).fetchall()
+        found.update((row[1], row) for row in rows)
+    return found
+
+def fetch_last_entry(conn):
+    # (epoch, offset) da última entrada gravada, ou None se o log estiver vazio
+    cursor = conn.cursor()
+    cursor.execute(LAST_ENTRY_SQL)
+    return cursor.fetchone()
+
+def fetch_epoch_bounds(conn, epoch):
+    # (primeiro, último) offset da epoch no log, ou None se não houver entradas dela
+    cursor = conn.cursor()
+    first = cursor.execute(FIRST_OFFSET_IN_EPOCH_SQL, (epoch,)).fetchone()[0]
+    if first is None:
+        return None
+    return first, cursor.execute(LAST_OFFSET_IN_EPOCH_SQL, (epoch,)).fetchone()[0]
+
+def insert_logs(conn, entries):
+    # Grava um lote inteiro de entradas numa única transação
+    with conn.lock:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_SQL, [(e.epoch, e.offset, e.content) for e in entries])
+        conn.commit()
+
+def copy_log_range(src, dst, start_offset, end_offset):
+    # Move de uma vez as entradas [start_offset, end_offset] de um banco para o outro
+    rows = fetch_log_range(src, start_offset, end_offset)
+    with dst.lock:
+        cursor = dst.cursor()
+        cursor.executemany(INSERT_SQL, rows)
+        dst.commit()
+    return rows
+
+class GroupCommitWriter:
+    # Junta as inserções de várias threads do servidor numa única transação.
+    # Cada submit devolve um Future que só termina depois do commit (linha durável).
+    # Um lote que continua falhando depois das novas tentativas para o writer (fail-stop): nenhuma
+    # linha posterior é gravada, então o prefixo durável nunca fica com um buraco no meio.
+    def __init__(self, conn, max_rows=GROUP_COMMIT_MAX_ROWS, max_delay=GROUP_COMMIT_MAX_DELAY, on_flush=None,
+                 on_failure=None):
+        self.conn = conn
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.on_failure = on_failure
+        self.cond = Condition()
+        self.queue = []
+        self.active = True
+        self.failed = None
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, epoch, offset, content):
+        future = Future()
+        with self.cond:
+            if self.failed is not None:
+                future.set_exception(self.failed)
+                return future
+            self.queue.append((time.time(), (epoch, offset, content), future))
+            self.cond.notify()
+        return future
+
+    def close(self):
+        with self.cond:
+            self.active = False
+            self.cond.notify()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.active and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                # Espera mais linhas até encher o grupo ou vencer o prazo da mais antiga
+                deadline = self.queue[0][0] + self.max_delay
+                while self.active and len(self.queue) < self.max_rows and time.time() < deadline:
+                    self.cond.wait(timeout=deadline - time.time())
+                batch = self.queue[:self.max_rows]
+                self.queue = self.queue[self.max_rows:]
+
+            rows = [row for _, row, _ in batch]
+            error = self.flush(rows)
+            if error is not None:
+                print(f"[BANCO] Group commit de {len(rows)} linhas falhou {GROUP_COMMIT_RETRIES + 1} vezes: "
+                      f"writer parado ({error})")
+                with self.cond:
+                    self.failed = error
+                    batch += self.queue
+                    self.queue = []
+                for _, _, future in batch:
+                    future.set_exception(error)
+                if self.on_failure:
+                    self.on_failure(error)
+                return
+
+            if self.on_flush:
+                self.on_flush(rows)
+            for _, row, future in batch:
+                future.set_result(row[1])
+
+    def flush(self, rows):
+        # INSERT OR IGNORE torna a nova tentativa segura mesmo se parte do lote já tiver entrado
+        for attempt in range(GROUP_COMMIT_RETRIES + 1):
+            try:
+                with self.conn.lock:
+                    cursor = self.conn.cursor()
+                    cursor.executemany(INSERT_SQL, rows)
+                    self.conn.commit()
+                return None
+            except Exception as e:
+                error = e
+                print(f"[BANCO] Falha no group commit de {len(rows)} linhas (tentativa {attempt + 1}): {e}")
+                try:
+                    with self.conn.lock:
+                        self.conn.rollback()
+                except Exception:
+                    pass
+            if attempt < GROUP_COMMIT_RETRIES:
+                time.sleep(GROUP_COMMIT_RETRY_BACKOFF)
+        return error
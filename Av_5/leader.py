@@ -1,82 +1,431 @@
+import asyncio
+import heapq
+import itertools
+import time
 import grpc
-from concurrent import futures
 import replicacao_dados_pb2 as pb2
 import replicacao_dados_pb2_grpc as pb2_grpc
-from threading import Lock
-from database import init_db, insert_log, fetch_log_entry
+from threading import Lock, Condition, Thread
+from database import (init_db, fetch_log_entry, fetch_log_range, fetch_last_entry, fetch_epoch_bounds, copy_log_range,
+                      GroupCommitWriter, STORAGE_PROFILE)
+from queries import query_entry, query_range, query_batch
+from channels import ChannelPool, SERVER_MODE
+from replication import ReplicationPipeline, REPLICATION_WINDOW, HEARTBEAT_INTERVAL
+from snapshot import SnapshotStore
+from log_cache import LogCache, LOG_CACHE_SIZE
+from cluster import CLUSTER, PREFERRED_LEADER, LEADER_HINT_KEY, node_port, lease_window
+
+# Tempo máximo (s) que o cliente espera pela confirmação da maioria
+QUORUM_TIMEOUT = 2.0
+# O índice de commit já segue junto do AppendEntries; o CommitData por offset é opcional
+USE_COMMIT_RPC = False
+# Quantidade de entradas por mensagem do StreamSyncLog
+SYNC_CHUNK_SIZE = 500
+# Tempo máximo (s) que uma leitura espera o líder obter ou renovar o lease antes de ser recusada
+LEASE_WAIT = 4 * HEARTBEAT_INTERVAL
+# Conteúdo da entrada que o líder eleito grava na própria epoch para commitar as entradas herdadas
+NOOP_CONTENT = ""
+# Intervalo (s) entre os registros de acertos e faltas do cache do log
+CACHE_STATS_INTERVAL = 30.0
+# Máximo de entradas aceitas num único ReceiveDataBatch
+MAX_CLIENT_BATCH = 1024
 
 class LeaderService(pb2_grpc.LeaderServiceServicer):
-    def __init__(self):
-        self.epoch = "1"
+    # Papel de líder de um nó do cluster. Criado pelo nó quando ele vence uma eleição, reaproveitando
+    # os bancos e o snapshot do nó; sem esses argumentos abre os bancos de `node_id` por conta própria.
+    def __init__(self, node_id=PREFERRED_LEADER, peers=None, epoch=None, db_intermediario=None, db_final=None,
+                 snapshots=None, on_step_down=None, replication_window=REPLICATION_WINDOW,
+                 use_commit_rpc=USE_COMMIT_RPC, storage_profile=STORAGE_PROFILE, cache_size=LOG_CACHE_SIZE):
+        self.node_id = node_id
+        self.epoch = epoch or "1"
         self.lock = Lock()
-        self.log = []
-        self.replicas = ["localhost:50052", "localhost:50053", "localhost:50054"]
-        self.db_intermediario = init_db("leader_intermediario.db")
-        self.db_final = init_db("leader_final.db")
+        self.active = True
+        self.on_step_down = on_step_down
+        if peers is None:
+            peers = [addr for other, addr in CLUSTER.items() if other != node_id]
+        self.replicas = list(peers)
+        if db_intermediario is None:
+            db_intermediario = init_db(f"{node_id}_intermediario.db", storage_profile)
+        if db_final is None:
+            db_final = init_db(f"{node_id}_final.db", storage_profile)
+        self.db_intermediario = db_intermediario
+        self.db_final = db_final
+        # Próximo offset a ser atribuído e as entradas mais recentes em memória; o resto fica no disco
+        self.next_offset = 0
+        self.cache = LogCache(cache_size)
+        self.durable_index = -1
+        self.commit_index = -1
+        self.recover(new_epoch=epoch is None)
+        # Entradas herdadas de epochs anteriores; até o commit passar delas o líder não responde leituras
+        self.inherited_index = self.durable_index
+        # Escritas no log intermediário agrupadas em poucas transações
+        self.writer = GroupCommitWriter(self.db_intermediario, on_flush=self.on_flush,
+                                        on_failure=self.on_storage_failure)
+        # Canais persistentes para as réplicas, criados uma única vez
+        self.channels = ChannelPool(self.replicas, pb2_grpc.ReplicaServiceStub)
+        self.use_commit_rpc = use_commit_rpc
+        # Snapshots periódicos do estado commitado e compactação do log intermediário
+        if snapshots is None:
+            snapshots = SnapshotStore(f"{node_id}_snapshot.db", self.db_final, self.db_intermediario)
+        self.snapshots = snapshots
+        # Um pipeline de replicação por réplica
+        self.replication_cond = Condition()
+        # Serializa os avanços do commit; a cópia para o banco final é feita fora do replication_cond
+        self.commit_lock = Lock()
+        # Funções chamadas com o novo índice de commit sempre que ele avança
+        self.commit_listeners = []
+        self.pipelines = {
+            addr: ReplicationPipeline(addr, self.channels.stub(addr), self.epoch, self.get_entry,
+                                      self.on_replica_match, window=replication_window,
+                                      snapshots=self.snapshots, last_offset=self.durable_index,
+                                      leader_id=self.node_id, on_higher_epoch=self.on_higher_epoch,
+                                      find_epoch_end=self.last_offset_in_epoch,
+                                      is_connected=lambda addr=addr: self.channels.is_healthy(addr))
+            for addr in self.replicas
+        }
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+        Thread(target=self.report_cache_stats, daemon=True).start()
+
+    def recover(self, new_epoch=True):
+        # O banco final só tem entradas commitadas e o intermediário tudo o que ficou durável.
+        # Só a cauda ainda não commitada volta para a memória e é reenviada às réplicas.
+        last_committed = fetch_last_entry(self.db_final)
+        last_durable = fetch_last_entry(self.db_intermediario) or last_committed
+        if last_committed is not None:
+            self.commit_index = last_committed[1]
+        if last_durable is not None:
+            self.durable_index = max(last_durable[1], self.commit_index)
+            # Sem eleição, nova epoch a cada reinício: entradas que chegaram às réplicas mas não
+            # ao disco do líder antes da queda passam a divergir e são descartadas por elas
+            if new_epoch:
+                self.epoch = str(int(last_durable[0]) + 1)
+        self.next_offset = self.durable_index + 1
+        pending = fetch_log_range(self.db_intermediario, self.commit_index + 1, self.durable_index)
+        self.cache.reset(self.commit_index + 1)
+        self.cache.mark_durable(self.durable_index)
+        for epoch, offset, content in pending:
+            self.cache.append(pb2.Data(epoch=epoch, offset=offset, content=content))
+        if last_durable is not None:
+            print(f"[LÍDER] Recuperado do disco: commit até {self.commit_index}, "
+                  f"{len(pending)} entradas pendentes, epoch {self.epoch}")
+
+    def quorum(self):
+        return len(self.replicas) // 2 + 1
 
     def ReceiveData(self, request, context):
+        appended = self.append_local([request.content])
+        if not appended:
+            return self.not_leader_ack()
+        data, durable = appended[0]
+        self.wait_for_quorum(data.offset)
+        return self.write_ack(data, durable)
+
+    def ReceiveDataBatch(self, request, context):
+        # Um lote do cliente recebe offsets consecutivos e espera o quórum uma única vez
+        if not request.entries:
+            return pb2.AckBatch()
+        if len(request.entries) > MAX_CLIENT_BATCH:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, self.batch_too_large(request))
+        appended = self.append_local([d.content for d in request.entries])
+        if not appended:
+            return pb2.AckBatch(acks=[self.not_leader_ack() for _ in request.entries])
+        self.wait_for_quorum(appended[-1][0].offset)
+        return pb2.AckBatch(acks=[self.write_ack(data, durable) for data, durable in appended])
+
+    def batch_too_large(self, request):
+        # Um lote enorme ficaria inteiro na memória até o writer gravá-lo
+        return f"Lote com {len(request.entries)} entradas; o máximo é {MAX_CLIENT_BATCH}."
+
+    def write_ack(self, data, durable):
+        # Resposta estruturada: o cliente sabe onde a escrita ficou sem consultar de novo
+        commit_index = self.commit_index
+        if durable.exception() is not None:
+            status, message = pb2.STORAGE_FAILED, "Falha ao gravar no log."
+        elif commit_index < data.offset and not self.active:
+            # Deposto antes do commit: o novo líder pode ou não manter a entrada
+            status, message = pb2.NOT_LEADER, "Líder deposto antes do commit."
+        elif commit_index < data.offset:
+            status, message = pb2.QUORUM_FAILED, "Falha no quórum."
+        else:
+            status, message = pb2.COMMITTED, "Gravação confirmada com commit."
+            if self.use_commit_rpc:
+                self.commit_to_replicas(data)
+        return pb2.Ack(message=message, status=status, offset=data.offset, epoch=data.epoch,
+                       commit_index=commit_index)
+
+    def append_local(self, contents):
+        # Atribui os offsets, grava no log intermediário e acorda os pipelines de replicação
+        appended = []
         with self.lock:
-            offset = len(self.log)
-            data = pb2.Data(epoch=self.epoch, offset=offset, content=request.content)
-            self.log.append(data)
-            insert_log(self.db_intermediario, data.epoch, data.offset, data.content)
-            print(f"[LÍDER] Recebido do cliente: {data}")
-
-        ack_count = self.propagate_to_replicas(data)
-        if ack_count >= len(self.replicas) // 2 + 1:
-            self.commit_to_replicas(data)
-            insert_log(self.db_final, data.epoch, data.offset, data.content)
-            return pb2.Ack(message="Gravação confirmada com commit.")
+            if not self.active:
+                return appended
+            for content in contents:
+                offset = self.next_offset
+                self.next_offset += 1
+                data = pb2.Data(epoch=self.epoch, offset=offset, content=content)
+                self.cache.append(data)
+                appended.append((data, self.writer.submit(data.epoch, data.offset, data.content)))
+                print(f"[LÍDER] Recebido do cliente: {data}")
+            self.propagate_to_replicas(offset)
+        return appended
+
+    def append_noop(self):
+        # Como no Raft: entradas herdadas só são commitadas junto com uma entrada da epoch atual. Sem ela
+        # o líder recém-eleito recusaria leituras até a próxima escrita de um cliente.
+        if self.inherited_index <= self.commit_index:
+            return
+        appended = self.append_local([NOOP_CONTENT])
+        if appended:
+            print(f"[LÍDER] Entrada vazia no offset {appended[0][0].offset} para commitar as herdadas "
+                  f"até {self.inherited_index}")
+
+    def not_leader_ack(self):
+        return pb2.Ack(message="Este nó não é mais o líder.", status=pb2.NOT_LEADER, offset=-1, epoch=self.epoch,
+                       commit_index=self.commit_index)
+
+    def on_higher_epoch(self, epoch):
+        print(f"[LÍDER] Epoch {epoch} maior que a minha ({self.epoch}): deixando a liderança")
+        if self.on_step_down:
+            self.on_step_down(epoch)
+
+    def stop(self):
+        # Para de aceitar escritas, encerra a replicação e grava o que ainda estava na fila
+        with self.lock:
+            if not self.active:
+                return
+            self.active = False
+        with self.replication_cond:
+            self.replication_cond.notify_all()
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+        self.writer.close()
+        self.channels.close()
+
+    def get_entry(self, offset):
+        entry = self.cache.get(offset)
+        if entry is not None:
+            return entry
+        # Fora do cache a entrada já foi gravada; se o intermediário foi compactado, está commitada no final
+        row = fetch_log_entry(self.db_intermediario, offset) or fetch_log_entry(self.db_final, offset)
+        if row is None:
+            raise LookupError(f"Offset {offset} fora do cache e dos bancos")
+        return pb2.Data(epoch=row[0], offset=row[1], content=row[2])
+
+    def last_offset_in_epoch(self, epoch):
+        # Entradas de epochs anteriores já estão todas no disco; as da epoch atual nunca conflitam
+        bounds = fetch_epoch_bounds(self.db_intermediario, epoch)
+        return bounds[1] if bounds is not None else None
+
+    def iter_committed(self, start_offset):
+        # Entradas commitadas a partir do offset, de todas as epochs, em blocos:
+        # do cache quando o bloco inteiro ainda está nele, senão do disco
+        commit_index = self.commit_index
+        while start_offset <= commit_index:
+            end_offset = min(start_offset + SYNC_CHUNK_SIZE - 1, commit_index)
+            entries = self.cache.get_range(start_offset, end_offset)
+            if entries is None:
+                entries = [pb2.Data(epoch=e, offset=o, content=c)
+                           for e, o, c in fetch_log_range(self.db_final, start_offset, end_offset)]
+            if entries:
+                yield entries
+            start_offset = end_offset + 1
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def report_cache_stats(self):
+        # Mostra periodicamente se as réplicas atrasadas ainda são atendidas da memória ou do disco
+        while True:
+            with self.replication_cond:
+                if self.replication_cond.wait_for(lambda: not self.active, timeout=CACHE_STATS_INTERVAL):
+                    return
+            stats = self.cache_stats()
+            print(f"[LÍDER] Cache do log: {stats['hits']} acertos, {stats['misses']} faltas "
+                  f"({stats['hit_ratio']:.1%}), offsets {stats['first_offset']}-{stats['next_offset'] - 1} em memória")
+
+    def propagate_to_replicas(self, offset):
+        # Cada pipeline envia as entradas em ordem para sua réplica
+        for pipeline in self.pipelines.values():
+            pipeline.append(offset)
+
+    def on_flush(self, rows):
+        # As linhas chegam ao writer na ordem dos offsets, então o prefixo durável é contíguo
+        with self.replication_cond:
+            self.durable_index = max(self.durable_index, rows[-1][1])
+        self.cache.mark_durable(rows[-1][1])
+        self.advance_commit()
+
+    def on_storage_failure(self, error):
+        # O writer parou sem gravar um lote: o durable_index fica no último offset contíguo e o líder
+        # sai, em vez de seguir aceitando escritas com um buraco no log local
+        print(f"[LÍDER] Log intermediário sem gravar ({error}): deixando a liderança")
+        if self.on_step_down:
+            self.on_step_down(None)
         else:
-            return pb2.Ack(message="Falha no quórum.")
+            Thread(target=self.stop, daemon=True).start()
 
-    def propagate_to_replicas(self, data):
-        ack_count = 0
-        for addr in self.replicas:
-            try:
-                channel = grpc.insecure_channel(addr)
-                stub = pb2_grpc.ReplicaServiceStub(channel)
-                resp = stub.ReceiveDataFromLeader(data)
-                if resp.message == "ACK":
-                    ack_count += 1
-            except Exception as e:
-                print(f"[LÍDER] Falha ao propagar para {addr}: {e}")
-        return ack_count
+    def on_replica_match(self, addr, match_index):
+        self.advance_commit()
+        # Cada confirmação também pode ter renovado o lease de quem espera para ler
+        with self.replication_cond:
+            self.replication_cond.notify_all()
+
+    def lease_expiry(self):
+        # O lease começa no envio mais antigo entre os que a maioria já confirmou
+        acked = sorted((p.acked_at for p in self.pipelines.values()), reverse=True)
+        return acked[self.quorum() - 1] + lease_window()
+
+    def has_lease(self):
+        return self.active and time.monotonic() < self.lease_expiry()
+
+    def read_ready(self):
+        return self.has_lease() and self.commit_index >= self.inherited_index
+
+    def confirm_leadership(self, context):
+        # Leitura linearizável sem ida e volta à maioria: enquanto o lease vale, nenhum outro líder
+        # pode ter sido eleito e o banco final tem tudo o que já foi confirmado a algum cliente
+        with self.replication_cond:
+            if self.replication_cond.wait_for(self.read_ready, timeout=LEASE_WAIT):
+                return
+            has_lease, commit_index = self.has_lease(), self.commit_index
+        if has_lease:
+            # Continua líder, só falta commitar o que herdou: o cliente tenta de novo neste mesmo nó
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION,
+                          f"{self.node_id} ainda commitando as entradas herdadas "
+                          f"(commit até {commit_index}, herdadas até {self.inherited_index})")
+        # Com o metadado de dica (vazio) o cliente sabe que o nó respondeu e procura o líder nos outros
+        context.set_trailing_metadata(((LEADER_HINT_KEY, ""),))
+        context.abort(grpc.StatusCode.UNAVAILABLE, f"{self.node_id} sem lease de líder em vigor")
+
+    def advance_commit(self):
+        # O índice de commit é o maior offset já confirmado pela maioria e gravado localmente
+        matches = sorted((p.match_index for p in self.pipelines.values()), reverse=True)
+        with self.commit_lock:
+            with self.replication_cond:
+                quorum_index = min(matches[self.quorum() - 1], self.durable_index)
+                if quorum_index <= self.commit_index or not self.active:
+                    return
+                start_offset = self.commit_index + 1
+            # Como no Raft, só entradas da própria epoch são commitadas contando réplicas;
+            # as de epochs anteriores entram junto com a primeira entrada nova
+            if self.get_entry(quorum_index).epoch != self.epoch:
+                return
+            # Quem espera o quórum ou o lease não fica parado durante a gravação no banco final
+            copy_log_range(self.db_intermediario, self.db_final, start_offset, quorum_index)
+            with self.replication_cond:
+                self.commit_index = quorum_index
+                self.replication_cond.notify_all()
+        for listener in self.commit_listeners:
+            listener(quorum_index)
+        # As réplicas recebem o novo índice no próximo lote ou heartbeat
+        for pipeline in self.pipelines.values():
+            pipeline.set_commit(quorum_index)
+        self.snapshots.maybe_compact(quorum_index)
+
+    def wait_for_quorum(self, offset):
+        # Retorna assim que a maioria confirmar, sem esperar as réplicas lentas
+        with self.replication_cond:
+            return self.replication_cond.wait_for(lambda: self.commit_index >= offset or not self.active,
+                                                  timeout=QUORUM_TIMEOUT)
 
     def commit_to_replicas(self, data):
         order = pb2.CommitOrder(epoch=data.epoch, offset=data.offset)
-        for addr in self.replicas:
-            try:
-                channel = grpc.insecure_channel(addr)
-                stub = pb2_grpc.ReplicaServiceStub(channel)
-                stub.CommitData(order)
-            except Exception as e:
-                print(f"[LÍDER] Falha ao enviar commit a {addr}: {e}")
+        for pipeline in self.pipelines.values():
+            pipeline.commit(order)
 
     def QueryData(self, request, context):
-        result = fetch_log_entry(self.db_final, request.offset)
-        if result:
-            epoch, offset, content = result
-            return pb2.QueryResponse(epoch=epoch, offset=offset, content=content)
-        else:
-            return pb2.QueryResponse(epoch="", offset=-1, content="Não encontrado")
-        
+        self.confirm_leadership(context)
+        return query_entry(self.db_final, request.offset, self.commit_index)
+
+    def QueryRange(self, request, context):
+        self.confirm_leadership(context)
+        yield from query_range(self.db_final, request.from_offset, request.to_offset, self.commit_index)
+
+    def QueryBatch(self, request, context):
+        self.confirm_leadership(context)
+        return query_batch(self.db_final, request.offsets, self.commit_index)
+
     def SyncLog(self, request, context):
-        cursor = self.db_final.cursor()
-        cursor.execute("SELECT epoch, offset, content FROM log WHERE epoch = ? AND offset >= ? ORDER BY offset",
-                    (request.epoch, request.offset))
-        entries = cursor.fetchall()
         return pb2.SyncLogResponse(
-            entries=[pb2.Data(epoch=e[0], offset=e[1], content=e[2]) for e in entries]
+            entries=[e for entries in self.iter_committed(request.offset) for e in entries]
         )
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    pb2_grpc.add_LeaderServiceServicer_to_server(LeaderService(), server)
-    server.add_insecure_port("[::]:50051")
-    print("Líder ativo na porta 50051...")
-    server.start()
-    server.wait_for_termination()
+    def StreamSyncLog(self, request, context):
+        # Envia o log em blocos; o controle de fluxo do gRPC segura o próximo bloco até o cliente consumir
+        for entries in self.iter_committed(request.offset):
+            yield pb2.SyncLogResponse(entries=entries)
+
+class AsyncLeaderService(LeaderService):
+    # Modo grpc.aio: as escritas esperam o quórum como corrotinas, sem prender uma thread
+    # do servidor durante a replicação. Os demais handlers continuam síncronos e rodam
+    # no pool de threads de migração do grpc.aio. `loop` é o loop do servidor.
+    def __init__(self, loop, **kwargs):
+        # Futures das escritas à espera do commit: (offset, seq, future), só mexidos no loop
+        self.loop = loop
+        self.waiters = []
+        self.waiter_seq = itertools.count()
+        super().__init__(**kwargs)
+        # Cada avanço do commit acorda o loop uma única vez, não uma vez por escrita
+        self.commit_listeners.append(lambda index: loop.call_soon_threadsafe(self.release_waiters, index))
+
+    async def ReceiveData(self, request, context):
+        appended = self.append_local([request.content])
+        if not appended:
+            return self.not_leader_ack()
+        data, durable = appended[0]
+        await self.wait_for_quorum_async(data.offset, durable)
+        return self.write_ack(data, durable)
+
+    async def ReceiveDataBatch(self, request, context):
+        if not request.entries:
+            return pb2.AckBatch()
+        if len(request.entries) > MAX_CLIENT_BATCH:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, self.batch_too_large(request))
+        appended = self.append_local([d.content for d in request.entries])
+        if not appended:
+            return pb2.AckBatch(acks=[self.not_leader_ack() for _ in request.entries])
+        last, last_durable = appended[-1]
+        await self.wait_for_quorum_async(last.offset, last_durable)
+        # Os demais offsets do lote são menores e saem antes do mesmo writer
+        pending = [asyncio.wrap_future(durable) for _, durable in appended if not durable.done()]
+        if pending:
+            await asyncio.wait(pending)
+        return pb2.AckBatch(acks=[self.write_ack(data, durable) for data, durable in appended])
+
+    async def wait_for_quorum_async(self, offset, durable):
+        if self.commit_index < offset:
+            committed = asyncio.get_running_loop().create_future()
+            self.add_waiter(offset, committed)
+            try:
+                await asyncio.wait_for(committed, timeout=QUORUM_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        # write_ack consulta o resultado da gravação local; espera o group commit sem bloquear o loop
+        if not durable.done():
+            await asyncio.wait([asyncio.wrap_future(durable)])
+
+    def add_waiter(self, offset, future):
+        heapq.heappush(self.waiters, (offset, next(self.waiter_seq), future))
+        self.release_waiters(self.commit_index)
+
+    def release_waiters(self, commit_index):
+        while self.waiters and self.waiters[0][0] <= commit_index:
+            future = heapq.heappop(self.waiters)[2]
+            if not future.done():
+                future.set_result(True)
+
+    def stop(self):
+        super().stop()
+        # Quem esperava o commit responde na hora que o líder foi deposto
+        self.loop.call_soon_threadsafe(self.release_waiters, float("inf"))
+
+def serve(storage_profile=STORAGE_PROFILE, server_mode=SERVER_MODE):
+    # O líder é um nó como os outros: o preferido do cluster, que começa a primeira eleição
+    # antes e, eleito, atende o LeaderService na porta 50051
+    from replica import serve as serve_node
+    serve_node(PREFERRED_LEADER, node_port(PREFERRED_LEADER), storage_profile, server_mode)
 
 if __name__ == "__main__":
-    serve()
\ No newline at end of file
+    import sys
+    serve(*sys.argv[1:3])
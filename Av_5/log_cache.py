@@ -0,0 +1,69 @@
+from threading import Lock
+
+# Quantidade de entradas recentes do log mantidas em memória pelo líder
+LOG_CACHE_SIZE = 4096
+
+class LogCache:
+    # Anel com as últimas entradas do log, indexado por offset. Entradas mais antigas que a
+    # capacidade são descartadas e ficam só no disco, mas só depois de gravadas: enquanto o writer
+    # não chega nelas, o cache é o único lugar onde estão, e o anel cresce em vez de descartá-las.
+    def __init__(self, capacity=LOG_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = [None] * capacity
+        self.lock = Lock()
+        self.first = 0
+        self.next = 0
+        # Maior offset já gravado no disco; só até ele as entradas podem sair do cache
+        self.durable = -1
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self, offset):
+        # Esvazia o cache; a próxima entrada adicionada deve ter este offset
+        with self.lock:
+            self.entries = [None] * self.capacity
+            self.first = offset
+            self.next = offset
+            self.durable = offset - 1
+
+    def mark_durable(self, offset):
+        with self.lock:
+            self.durable = max(self.durable, offset)
+
+    def append(self, entry):
+        with self.lock:
+            self.next = entry.offset + 1
+            self.first = max(self.first, min(self.next - self.capacity, self.durable + 1))
+            if self.next - self.first > len(self.entries):
+                self.grow(self.next - self.first)
+            self.entries[entry.offset % len(self.entries)] = entry
+
+    def grow(self, size):
+        # Chamado com o lock: copia as entradas ainda guardadas para um anel maior
+        entries = [None] * max(size, 2 * len(self.entries))
+        for offset in range(self.first, self.next - 1):
+            entries[offset % len(entries)] = self.entries[offset % len(self.entries)]
+        self.entries = entries
+
+    def get(self, offset):
+        with self.lock:
+            if self.first <= offset < self.next:
+                self.hits += 1
+                return self.entries[offset % len(self.entries)]
+            self.misses += 1
+            return None
+
+    def get_range(self, start_offset, end_offset):
+        # Entradas [start_offset, end_offset], ou None se alguma já saiu do cache
+        with self.lock:
+            if self.first <= start_offset and end_offset < self.next:
+                self.hits += 1
+                return [self.entries[o % len(self.entries)] for o in range(start_offset, end_offset + 1)]
+            self.misses += 1
+            return None
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0,
+                    "first_offset": self.first, "next_offset": self.next}
@@ -0,0 +1,27 @@
+import replicacao_dados_pb2 as pb2
+from database import fetch_log_entry, fetch_log_entries, iter_log_range, RANGE_CHUNK_SIZE
+
+# Leituras do banco final comuns ao líder e às réplicas. Cada resposta leva o índice de commit
+# em que a leitura foi feita, para o cliente exigir réplicas pelo menos tão novas depois.
+
+def entry_response(row, commit_index):
+    if row is None:
+        return pb2.QueryResponse(epoch="", offset=-1, content="Não encontrado", commit_index=commit_index)
+    epoch, offset, content = row
+    return pb2.QueryResponse(epoch=epoch, offset=offset, content=content, commit_index=commit_index)
+
+def query_entry(conn, offset, commit_index):
+    return entry_response(fetch_log_entry(conn, offset), commit_index)
+
+def query_range(conn, from_offset, to_offset, commit_index):
+    # [from_offset, to_offset) em blocos; to_offset negativo vai até o fim do que já está commitado
+    end_offset = commit_index if to_offset < 0 else min(to_offset - 1, commit_index)
+    for rows in iter_log_range(conn, from_offset, end_offset, RANGE_CHUNK_SIZE):
+        yield pb2.QueryBatchResponse(entries=[entry_response(row, commit_index) for row in rows],
+                                     commit_index=commit_index)
+
+def query_batch(conn, offsets, commit_index):
+    # Na ordem pedida; os ausentes vêm com offset -1
+    found = fetch_log_entries(conn, offsets)
+    return pb2.QueryBatchResponse(entries=[entry_response(found.get(offset), commit_index) for offset in offsets],
+                                  commit_index=commit_index)
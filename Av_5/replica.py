@@ -1,14 +1,261 @@
+import asyncio
+import itertools
+import random
+import time
 import grpc
 from concurrent import futures
+from threading import Condition, Lock, Thread
 import replicacao_dados_pb2 as pb2
 import replicacao_dados_pb2_grpc as pb2_grpc
-from database import init_db, insert_log, fetch_log_entry
+from database import (init_db, insert_log, insert_logs, fetch_log_entry, fetch_log_entries, fetch_last_entry,
+                      fetch_epoch_bounds, copy_log_range, load_node_state, save_node_state, STORAGE_PROFILE,
+                      MAX_OFFSET_SQL, TRUNCATE_SQL)
+from channels import ChannelPool, SERVER_OPTIONS, SERVER_MODE, SERVER_WORKERS
+from snapshot import SnapshotStore
+from queries import query_entry, query_range, query_batch
+from leader import LeaderService, AsyncLeaderService
+from cluster import (CLUSTER, PREFERRED_LEADER, ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX, STARTUP_ELECTION_DELAY,
+                     LEADER_HINT_KEY, LEASE_DURATION, epoch_number, check_lease_timing)
+from replication import HEARTBEAT_INTERVAL
+
+# Tempo máximo (s) que uma entrada fora de ordem espera pela anterior antes de sincronizar
+GAP_WAIT = 0.5
+# Tempo máximo (s) que uma leitura espera a réplica alcançar o índice de commit pedido
+READ_WAIT = 0.2
+# Intervalo (s) entre as verificações do prazo de eleição
+ELECTION_TICK = 0.01
+# Atraso (offsets) em relação ao commit do líder a partir do qual a réplica puxa as entradas commitadas
+# pelo StreamSyncLog, em vez de esperar os lotes do AppendEntries, limitados pela janela de replicação
+CATCH_UP_MIN_GAP = 256
 
 class ReplicaService(pb2_grpc.ReplicaServiceServicer):
-    def __init__(self, replica_id):
+    # Um nó do cluster. Segue o líder da epoch atual; sem heartbeats dentro do prazo de eleição
+    # vira candidato, pede votos e, eleito, passa a atender o LeaderService com um LeaderService
+    # criado sobre os próprios bancos.
+    def __init__(self, replica_id, storage_profile=STORAGE_PROFILE, leader_factory=LeaderService, cluster=CLUSTER):
+        check_lease_timing(HEARTBEAT_INTERVAL)
         self.replica_id = replica_id
-        self.db_intermediario = init_db(f"{replica_id}_intermediario.db")
-        self.db_final = init_db(f"{replica_id}_final.db")
+        self.db_intermediario = init_db(f"{replica_id}_intermediario.db", storage_profile)
+        self.db_final = init_db(f"{replica_id}_final.db", storage_profile)
+        self.cluster = cluster
+        self.peers = {node: addr for node, addr in cluster.items() if node != replica_id}
+        # Canais persistentes para os outros nós: votos e sincronização com o líder
+        self.peer_channels = ChannelPool(list(self.peers.values()), pb2_grpc.ReplicaServiceStub)
+        self.leader_channels = ChannelPool(list(self.peers.values()), pb2_grpc.LeaderServiceStub)
+        # Sinaliza a chegada de novas entradas para quem aguarda um offset anterior
+        self.applied = Condition()
+        # Alcance pelo StreamSyncLog: se está em andamento e o intervalo (primeiro, último) de entradas
+        # commitadas já gravado por ele, protegidos por `applied`
+        self.catching_up = False
+        self.synced = None
+        self.commit_lock = Lock()
+        # Avisa as leituras que esperam a réplica alcançar um índice de commit
+        self.committed = Condition(self.commit_lock)
+        # Serializa as cópias para o banco final, feitas fora do commit_lock para não segurar as leituras
+        self.apply_lock = Lock()
+        # Retoma do que já estava commitado no disco; o líder reenvia só o que faltar
+        last_committed = fetch_last_entry(self.db_final)
+        self.commit_index = last_committed[1] if last_committed is not None else -1
+        self.snapshots = SnapshotStore(f"{replica_id}_snapshot.db", self.db_final, self.db_intermediario)
+        # Estado da eleição: epoch atual e voto persistidos, líder conhecido e o papel de líder, se houver
+        self.state_lock = Lock()
+        self.leader_factory = leader_factory
+        state = load_node_state(self.db_intermediario)
+        self.current_epoch = str(max(epoch_number(state.get("current_epoch")),
+                                     epoch_number(self.last_log_entry()[0])))
+        self.voted_for = state.get("voted_for") or None
+        self.leader_id = None
+        self.leader = None
+        self.election_started = None
+        self.leader_contact = float("-inf")
+        # O nó preferido tenta a primeira eleição antes; os outros dão tempo para ele subir
+        delay = 0 if replica_id == PREFERRED_LEADER else STARTUP_ELECTION_DELAY
+        self.election_deadline = time.monotonic() + delay + random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
+        print(f"[{replica_id}] Retomando: commit até {self.commit_index}, log até {self.get_max_offset()}, "
+              f"epoch {self.current_epoch}")
+
+    def start(self):
+        Thread(target=self.run_election_timer, daemon=True).start()
+
+    def last_log_entry(self):
+        # (epoch, offset) da última entrada do log local, usada para comparar logs numa eleição
+        last = fetch_last_entry(self.db_intermediario) or fetch_last_entry(self.db_final)
+        return last if last is not None else ("", -1)
+
+    def leader_addr(self):
+        return self.cluster.get(self.leader_id)
+
+    def reset_election_timer(self):
+        self.election_deadline = time.monotonic() + random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
+
+    def observe_epoch(self, epoch, leader_id=None):
+        # Chamado com state_lock. Uma epoch maior zera o voto e depõe este nó se ele for o líder.
+        if epoch_number(epoch) > epoch_number(self.current_epoch):
+            self.current_epoch = epoch
+            self.voted_for = None
+            save_node_state(self.db_intermediario, current_epoch=self.current_epoch, voted_for="")
+            self.leader_id = None
+            if self.leader is not None:
+                self.step_down()
+        if leader_id:
+            if self.leader_id != leader_id:
+                print(f"[{self.replica_id}] Seguindo o líder {leader_id} na epoch {epoch}")
+            self.leader_id = leader_id
+
+    def step_down(self):
+        # Encerra o papel de líder antes de voltar a aplicar lotes de outro líder
+        leader = self.leader
+        self.leader = None
+        leader.stop()
+        with self.commit_lock:
+            self.commit_index = max(self.commit_index, leader.commit_index)
+        print(f"[{self.replica_id}] Deixou de ser líder (epoch {self.current_epoch})")
+
+    def on_leader_step_down(self, epoch):
+        # Vem da thread de resposta de um pipeline ou do writer: o trabalho pesado vai para outra thread.
+        # Sem epoch, o próprio papel de líder pediu para sair (falha ao gravar o log)
+        leader = self.leader
+        def run():
+            with self.state_lock:
+                if epoch is not None:
+                    self.observe_epoch(epoch)
+                elif leader is not None and self.leader is leader:
+                    self.leader_id = None
+                    self.step_down()
+        Thread(target=run, daemon=True).start()
+
+    def on_leader_commit(self, commit_index):
+        with self.commit_lock:
+            if commit_index > self.commit_index:
+                self.commit_index = commit_index
+                self.committed.notify_all()
+
+    def run_election_timer(self):
+        while True:
+            time.sleep(ELECTION_TICK)
+            with self.state_lock:
+                due = self.leader is None and time.monotonic() >= self.election_deadline
+            if due:
+                self.start_election()
+
+    def start_election(self):
+        started = time.monotonic()
+        with self.state_lock:
+            # Prazo vencido: o líder conhecido deixa de ser indicado aos clientes
+            self.leader_id = None
+            self.reset_election_timer()
+            epoch = str(epoch_number(self.current_epoch) + 1)
+            last_epoch, last_offset = self.last_log_entry()
+        if self.election_started is None:
+            self.election_started = time.monotonic()
+        # Pré-votação: só aumenta a epoch se a maioria também estiver sem líder. Assim um nó que
+        # reiniciou ou ficou isolado não derruba um líder que ainda fala com os outros.
+        request = pb2.VoteRequest(epoch=epoch, candidate_id=self.replica_id, last_offset=last_offset,
+                                  last_epoch=last_epoch, pre_vote=True)
+        if not self.collect_votes(request):
+            return
+
+        with self.state_lock:
+            # Um líder pode ter se manifestado enquanto os pré-votos chegavam
+            if self.leader_contact >= started or epoch_number(self.current_epoch) >= epoch_number(epoch):
+                return
+            self.current_epoch = epoch
+            self.voted_for = self.replica_id
+            save_node_state(self.db_intermediario, current_epoch=self.current_epoch, voted_for=self.replica_id)
+            self.reset_election_timer()
+        print(f"[{self.replica_id}] Sem líder: iniciando eleição na epoch {epoch}")
+        request.pre_vote = False
+        if not self.collect_votes(request):
+            return
+
+        with self.state_lock:
+            # Outro líder pode ter aparecido nesta epoch enquanto os votos chegavam
+            if self.current_epoch != epoch or self.leader_id is not None:
+                return
+            self.become_leader(epoch)
+
+    def collect_votes(self, request):
+        # Pede os votos a todos os nós em paralelo; True se a maioria (contando o próprio voto) aceitar
+        needed = len(self.cluster) // 2 + 1
+        tally = {"granted": 1, "answered": 0, "higher": None}
+        cond = Condition()
+
+        def on_vote(future):
+            try:
+                resp = future.result()
+            except grpc.RpcError:
+                resp = None
+            with cond:
+                tally["answered"] += 1
+                if resp is not None and epoch_number(resp.epoch) > epoch_number(request.epoch):
+                    tally["higher"] = resp.epoch
+                elif resp is not None and resp.granted:
+                    tally["granted"] += 1
+                cond.notify_all()
+
+        for addr in self.peers.values():
+            future = self.peer_channels.stub(addr).RequestVote.future(request, timeout=ELECTION_TIMEOUT_MIN)
+            future.add_done_callback(on_vote)
+        with cond:
+            cond.wait_for(lambda: tally["granted"] >= needed or tally["higher"] is not None
+                          or tally["answered"] == len(self.peers), timeout=ELECTION_TIMEOUT_MAX)
+            granted, higher = tally["granted"], tally["higher"]
+        if higher is not None:
+            with self.state_lock:
+                self.observe_epoch(higher)
+            return False
+        return granted >= needed
+
+    def become_leader(self, epoch):
+        # Chamado com state_lock
+        self.leader = self.leader_factory(node_id=self.replica_id, peers=list(self.peers.values()), epoch=epoch,
+                                          db_intermediario=self.db_intermediario, db_final=self.db_final,
+                                          snapshots=self.snapshots, on_step_down=self.on_leader_step_down)
+        self.leader.commit_listeners.append(self.on_leader_commit)
+        self.leader.append_noop()
+        self.leader_id = self.replica_id
+        elapsed = (time.monotonic() - self.election_started) * 1000
+        self.election_started = None
+        print(f"[{self.replica_id}] Eleito líder na epoch {epoch} ({elapsed:.0f} ms desde o fim do prazo)")
+
+    def RequestVote(self, request, context):
+        with self.state_lock:
+            if request.pre_vote:
+                return pb2.VoteResponse(epoch=self.current_epoch, granted=self.grant_pre_vote(request))
+            if self.in_lease():
+                # Ignora a epoch do candidato: o líder atual ainda conta com este nó
+                print(f"[{self.replica_id}] Voto para {request.candidate_id} na epoch {request.epoch}: "
+                      f"não (lease do líder em vigor)")
+                return pb2.VoteResponse(epoch=self.current_epoch, granted=False)
+            self.observe_epoch(request.epoch)
+            granted = False
+            if request.epoch == self.current_epoch and self.voted_for in (None, request.candidate_id):
+                # Só vota em quem tem um log pelo menos tão atualizado quanto o seu
+                if self.log_up_to_date(request):
+                    granted = True
+                    self.voted_for = request.candidate_id
+                    save_node_state(self.db_intermediario, current_epoch=self.current_epoch,
+                                    voted_for=request.candidate_id)
+                    self.reset_election_timer()
+            print(f"[{self.replica_id}] Voto para {request.candidate_id} na epoch {request.epoch}: "
+                  f"{'sim' if granted else 'não'}")
+            return pb2.VoteResponse(epoch=self.current_epoch, granted=granted)
+
+    def grant_pre_vote(self, request):
+        # Chamado com state_lock. Não muda o estado: só diz se votaria na próxima epoch
+        return (epoch_number(request.epoch) > epoch_number(self.current_epoch) and self.leader is None
+                and not self.in_lease() and self.log_up_to_date(request))
+
+    def in_lease(self):
+        # Chamado com state_lock. Enquanto o lease do último líder ouvido vale, nenhum voto é dado:
+        # é o que permite a esse líder responder leituras sozinho
+        if self.leader is not None:
+            return self.leader.has_lease()
+        return time.monotonic() - self.leader_contact < LEASE_DURATION
+
+    def log_up_to_date(self, request):
+        last_epoch, last_offset = self.last_log_entry()
+        return (epoch_number(request.last_epoch), request.last_offset) >= (epoch_number(last_epoch), last_offset)
 
     def ReceiveDataFromLeader(self, request, context):
         local_entry = self.get_entry_by_offset(request.offset)
@@ -18,25 +265,131 @@ class ReplicaService(pb2_grpc.ReplicaServiceServicer):
             print(f"[{self.replica_id}] Entrada já presente. Ignorando.")
             return pb2.Ack(message="ACK")
 
-        # Se já tem uma entrada diferente nesse offset, trunca e sincroniza
-        if local_entry is not None and local_entry != (request.epoch, request.offset, request.content):
-            print(f"[{self.replica_id}] Divergência no offset {request.offset}. Iniciando sincronização...")
+        # Se já tem uma entrada diferente nesse offset, descarta só ela e o que vem depois;
+        # a entrada do líder entra no lugar logo abaixo
+        if local_entry is not None:
+            print(f"[{self.replica_id}] Divergência no offset {request.offset}.")
             self.truncate_log_from_offset(request.offset)
-            self.sync_log_from_leader(request.epoch, request.offset)
-            return pb2.Ack(message="ACK")
+            local_entry = None
 
         # Se a entrada está a frente, busca os dados faltantes
         if local_entry is None:
+            # O líder mantém várias entradas em trânsito; espera um pouco pela anterior
+            with self.applied:
+                self.applied.wait_for(lambda: self.get_max_offset() >= request.offset - 1, timeout=GAP_WAIT)
             max_offset = self.get_max_offset()
             if request.offset > max_offset + 1:
                 print(f"[{self.replica_id}] Gap detectado. Sincronizando de {max_offset+1} até {request.offset}")
-                self.sync_log_from_leader(request.epoch, max_offset + 1)
+                self.catch_up(max_offset + 1)
 
             # Insere a nova entrada normalmente
             insert_log(self.db_intermediario, request.epoch, request.offset, request.content)
+            with self.applied:
+                self.applied.notify_all()
             print(f"[{self.replica_id}] Entrada sincronizada/recebida: {request}")
             return pb2.Ack(message="ACK")
 
+    def AppendEntries(self, request, context):
+        with self.state_lock:
+            if epoch_number(request.epoch) < epoch_number(self.current_epoch):
+                # Líder de uma epoch antiga: a epoch na resposta faz ele deixar a liderança
+                return pb2.AppendEntriesResponse(success=False, match_offset=-1, epoch=self.current_epoch)
+            self.observe_epoch(request.epoch, request.leader_id)
+            self.leader_contact = time.monotonic()
+            self.reset_election_timer()
+
+        # Checagem de consistência: a réplica precisa ter a entrada anterior ao lote.
+        # Entradas já compactadas estão commitadas e por isso sempre conferem.
+        if request.prev_offset > self.snapshots.compacted_offset:
+            with self.applied:
+                self.applied.wait_for(lambda: self.get_max_offset() >= request.prev_offset, timeout=GAP_WAIT)
+            prev_entry = self.get_entry_by_offset(request.prev_offset)
+            if prev_entry is None:
+                max_offset = self.get_max_offset()
+                print(f"[{self.replica_id}] Lote rejeitado: offset {request.prev_offset} ausente (log até {max_offset})")
+                if request.leader_commit - max_offset >= CATCH_UP_MIN_GAP:
+                    self.start_catch_up(max_offset + 1)
+                return pb2.AppendEntriesResponse(success=False, match_offset=max_offset, epoch=self.current_epoch,
+                                                 conflict_offset=max_offset + 1)
+            if prev_entry[0] != request.prev_epoch:
+                # Indica a epoch conflitante e onde ela começa aqui: o líder pula a epoch inteira
+                # numa só ida e volta em vez de recuar um offset por rejeição
+                first, _ = fetch_epoch_bounds(self.db_intermediario, prev_entry[0])
+                conflict_offset = max(first, self.snapshots.compacted_offset + 1)
+                print(f"[{self.replica_id}] Lote rejeitado: divergência no offset {request.prev_offset} "
+                      f"(epoch {prev_entry[0]} desde o offset {conflict_offset})")
+                return pb2.AppendEntriesResponse(success=False, match_offset=conflict_offset - 1,
+                                                 epoch=self.current_epoch, conflict_epoch=prev_entry[0],
+                                                 conflict_offset=conflict_offset)
+
+        entries = [e for e in request.entries if e.offset > self.snapshots.compacted_offset]
+        if entries:
+            # Entradas que já estão aqui iguais são puladas; na primeira divergente só o sufixo a partir
+            # dela é descartado
+            local = fetch_log_entries(self.db_intermediario, [e.offset for e in entries])
+            for i, entry in enumerate(entries):
+                local_entry = local.get(entry.offset)
+                if local_entry is None:
+                    entries = entries[i:]
+                    break
+                if local_entry != (entry.epoch, entry.offset, entry.content):
+                    print(f"[{self.replica_id}] Divergência no offset {entry.offset}.")
+                    self.truncate_log_from_offset(entry.offset)
+                    entries = entries[i:]
+                    break
+            else:
+                entries = []
+
+        if entries:
+            insert_logs(self.db_intermediario, entries)
+            with self.applied:
+                self.applied.notify_all()
+            print(f"[{self.replica_id}] Lote recebido: offsets {entries[0].offset}-{entries[-1].offset}")
+
+        match_offset = request.prev_offset + len(request.entries)
+        if request.leader_commit - match_offset >= CATCH_UP_MIN_GAP and self.get_max_offset() == match_offset:
+            self.start_catch_up(match_offset + 1)
+        match_offset = self.extend_match(match_offset)
+        # Commit piggyback: só até a última entrada que o líder confirmou nesta chamada
+        self.commit_up_to(min(request.leader_commit, match_offset))
+        return pb2.AppendEntriesResponse(success=True, match_offset=match_offset, epoch=self.current_epoch)
+
+    def commit_up_to(self, offset):
+        # Move do intermediário para o final todas as entradas até o offset de uma vez
+        with self.apply_lock:
+            with self.commit_lock:
+                if offset <= self.commit_index:
+                    return
+                start_offset = self.commit_index + 1
+            copy_log_range(self.db_intermediario, self.db_final, start_offset, offset)
+            with self.commit_lock:
+                self.commit_index = max(self.commit_index, offset)
+                self.committed.notify_all()
+        print(f"[{self.replica_id}] COMMIT até o offset {offset}")
+        self.snapshots.maybe_compact(offset)
+
+    def InstallSnapshot(self, request_iterator, context):
+        chunks = iter(request_iterator)
+        first = next(chunks, None)
+        with self.state_lock:
+            if first is None or epoch_number(first.epoch) < epoch_number(self.current_epoch):
+                return pb2.AppendEntriesResponse(success=False, match_offset=-1, epoch=self.current_epoch)
+            self.observe_epoch(first.epoch)
+            self.leader_contact = time.monotonic()
+            self.reset_election_timer()
+        with self.applied:
+            self.synced = None
+        with self.apply_lock:
+            last_included_offset = self.snapshots.install(itertools.chain([first], chunks))
+            with self.commit_lock:
+                self.commit_index = last_included_offset
+                self.committed.notify_all()
+        with self.applied:
+            self.applied.notify_all()
+        # Só o snapshot foi conferido pelo líder: a cauda que o intermediário manteve depois dele
+        # é verificada e estendida pelo AppendEntries a partir daqui
+        return pb2.AppendEntriesResponse(success=True, match_offset=last_included_offset, epoch=self.current_epoch)
+
     def CommitData(self, request, context):
         result = fetch_log_entry(self.db_intermediario, request.offset)
         if result:
@@ -45,41 +398,179 @@ class ReplicaService(pb2_grpc.ReplicaServiceServicer):
             print(f"[{self.replica_id}] COMMIT: {epoch}, {offset}, {content}")
         return pb2.Ack(message="Commit ok")
 
+    def wait_for_commit(self, min_commit_index, context):
+        # Leituras só são servidas depois que a réplica commitou até min_commit_index
+        with self.committed:
+            if not self.committed.wait_for(lambda: self.commit_index >= min_commit_index, timeout=READ_WAIT):
+                context.abort(grpc.StatusCode.FAILED_PRECONDITION,
+                              f"réplica commitada até {self.commit_index}, pedido {min_commit_index}")
+            return self.commit_index
+
+    def QueryData(self, request, context):
+        commit_index = self.wait_for_commit(request.min_commit_index, context)
+        return query_entry(self.db_final, request.offset, commit_index)
+
+    def QueryRange(self, request, context):
+        commit_index = self.wait_for_commit(request.min_commit_index, context)
+        yield from query_range(self.db_final, request.from_offset, request.to_offset, commit_index)
+
+    def QueryBatch(self, request, context):
+        commit_index = self.wait_for_commit(request.min_commit_index, context)
+        return query_batch(self.db_final, request.offsets, commit_index)
+
     def get_entry_by_offset(self, offset):
-        cursor = self.db_intermediario.cursor()
-        cursor.execute("SELECT epoch, offset, content FROM log WHERE offset = ?", (offset,))
-        return cursor.fetchone()
+        return fetch_log_entry(self.db_intermediario, offset)
 
     def get_max_offset(self):
         cursor = self.db_intermediario.cursor()
-        cursor.execute("SELECT MAX(offset) FROM log")
+        cursor.execute(MAX_OFFSET_SQL)
         result = cursor.fetchone()
-        return result[0] if result[0] is not None else -1
+        return max(result[0] if result[0] is not None else -1, self.snapshots.compacted_offset)
 
     def truncate_log_from_offset(self, offset):
-        cursor = self.db_intermediario.cursor()
-        cursor.execute("DELETE FROM log WHERE offset >= ?", (offset,))
-        self.db_intermediario.commit()
+        # Com `applied`, para o alcance em andamento não gravar depois de um buraco
+        with self.applied:
+            with self.db_intermediario.lock:
+                cursor = self.db_intermediario.cursor()
+                cursor.execute(TRUNCATE_SQL, (offset,))
+                self.db_intermediario.commit()
+            if self.synced is not None and offset <= self.synced[1]:
+                self.synced = None
         print(f"[{self.replica_id}] Log truncado a partir do offset {offset}")
 
-    def sync_log_from_leader(self, epoch, start_offset):
-        channel = grpc.insecure_channel("localhost:50051")
-        stub = pb2_grpc.LeaderServiceStub(channel)
-        request = pb2.SyncLogRequest(epoch=epoch, offset=start_offset)
-        response = stub.SyncLog(request)
-        for entry in response.entries:
-            insert_log(self.db_intermediario, entry.epoch, entry.offset, entry.content)
-            print(f"[{self.replica_id}] Sincronizado do líder: {entry}")
+    def start_catch_up(self, start_offset):
+        # Uma réplica muito atrasada puxa o que falta numa thread; enquanto isso os lotes seguem rejeitados
+        with self.applied:
+            if self.catching_up:
+                return
+            self.catching_up = True
+        def run():
+            try:
+                self.catch_up(start_offset)
+            except grpc.RpcError as e:
+                print(f"[{self.replica_id}] Falha ao sincronizar com o líder: {e.code()}")
+            finally:
+                with self.applied:
+                    self.catching_up = False
+        Thread(target=run, daemon=True).start()
+
+    def catch_up(self, start_offset):
+        with self.applied:
+            self.synced = (start_offset, start_offset - 1)
+        self.sync_log_from_leader(start_offset)
+
+    def extend_match(self, match_offset):
+        # As entradas que vieram pelo StreamSyncLog já estão commitadas e conferem com qualquer líder:
+        # se o prefixo confirmado pelo lote encosta nelas, a réplica confirma até a última
+        with self.applied:
+            if self.synced is not None and self.synced[0] - 1 <= match_offset < self.synced[1]:
+                return self.synced[1]
+        return match_offset
+
+    def sync_log_from_leader(self, start_offset):
+        # Só as entradas commitadas que faltam, de qualquer epoch, pelo canal persistente do líder
+        stub = self.leader_channels.stub(self.leader_addr() or self.cluster[PREFERRED_LEADER])
+        request = pb2.SyncLogRequest(offset=start_offset)
+        # Cada bloco recebido é gravado numa transação antes de pedir o próximo
+        for response in stub.StreamSyncLog(request):
+            with self.applied:
+                if self.synced is None or self.synced[1] + 1 != response.entries[0].offset:
+                    # Um truncamento ou snapshot mexeu no log: o resto chega pelo AppendEntries
+                    return
+                insert_logs(self.db_intermediario, response.entries)
+                self.synced = (self.synced[0], response.entries[-1].offset)
+                self.applied.notify_all()
+            print(f"[{self.replica_id}] Sincronizados do líder: offsets "
+                  f"{response.entries[0].offset}-{response.entries[-1].offset}")
+
+
+class LeaderEndpoint(pb2_grpc.LeaderServiceServicer):
+    # LeaderService no endereço do nó: repassa ao papel de líder se este nó foi eleito;
+    # senão recusa com UNAVAILABLE e o endereço do líder conhecido no metadado LEADER_HINT_KEY
+    def __init__(self, node):
+        self.node = node
+
+    def not_leader(self):
+        return (f"{self.node.replica_id} não é o líder", ((LEADER_HINT_KEY, self.node.leader_addr() or ""),))
+
+    def current(self, context):
+        leader = self.node.leader
+        if leader is None:
+            details, metadata = self.not_leader()
+            context.set_trailing_metadata(metadata)
+            context.abort(grpc.StatusCode.UNAVAILABLE, details)
+        return leader
 
+    def ReceiveData(self, request, context):
+        return self.current(context).ReceiveData(request, context)
 
-def serve(replica_id, port):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    pb2_grpc.add_ReplicaServiceServicer_to_server(ReplicaService(replica_id), server)
+    def ReceiveDataBatch(self, request, context):
+        return self.current(context).ReceiveDataBatch(request, context)
+
+    def CommitData(self, request, context):
+        return self.current(context).CommitData(request, context)
+
+    def QueryData(self, request, context):
+        return self.current(context).QueryData(request, context)
+
+    def QueryRange(self, request, context):
+        return self.current(context).QueryRange(request, context)
+
+    def QueryBatch(self, request, context):
+        return self.current(context).QueryBatch(request, context)
+
+    def SyncLog(self, request, context):
+        return self.current(context).SyncLog(request, context)
+
+    def StreamSyncLog(self, request, context):
+        return self.current(context).StreamSyncLog(request, context)
+
+class AsyncLeaderEndpoint(LeaderEndpoint):
+    # No modo grpc.aio as escritas são corrotinas do AsyncLeaderService
+    async def current_async(self, context):
+        leader = self.node.leader
+        if leader is None:
+            details, metadata = self.not_leader()
+            context.set_trailing_metadata(metadata)
+            await context.abort(grpc.StatusCode.UNAVAILABLE, details)
+        return leader
+
+    async def ReceiveData(self, request, context):
+        return await (await self.current_async(context)).ReceiveData(request, context)
+
+    async def ReceiveDataBatch(self, request, context):
+        return await (await self.current_async(context)).ReceiveDataBatch(request, context)
+
+def serve(replica_id, port, storage_profile=STORAGE_PROFILE, server_mode=SERVER_MODE):
+    if server_mode == "aio":
+        asyncio.run(serve_aio(replica_id, port, storage_profile))
+        return
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=SERVER_WORKERS), options=SERVER_OPTIONS)
+    node = ReplicaService(replica_id, storage_profile)
+    pb2_grpc.add_ReplicaServiceServicer_to_server(node, server)
+    pb2_grpc.add_LeaderServiceServicer_to_server(LeaderEndpoint(node), server)
     server.add_insecure_port(f"[::]:{port}")
     print(f"{replica_id} rodando na porta {port}...")
     server.start()
+    node.start()
     server.wait_for_termination()
 
+async def serve_aio(replica_id, port, storage_profile=STORAGE_PROFILE):
+    # Só as escritas do líder são corrotinas; os handlers da réplica são curtos (gravar um lote,
+    # ler o banco final) e rodam no pool de threads de migração do grpc.aio
+    server = grpc.aio.server(migration_thread_pool=futures.ThreadPoolExecutor(max_workers=SERVER_WORKERS),
+                             options=SERVER_OPTIONS)
+    loop = asyncio.get_running_loop()
+    node = ReplicaService(replica_id, storage_profile,
+                          leader_factory=lambda **kwargs: AsyncLeaderService(loop, **kwargs))
+    pb2_grpc.add_ReplicaServiceServicer_to_server(node, server)
+    pb2_grpc.add_LeaderServiceServicer_to_server(AsyncLeaderEndpoint(node), server)
+    server.add_insecure_port(f"[::]:{port}")
+    print(f"{replica_id} rodando na porta {port} (grpc.aio)...")
+    await server.start()
+    node.start()
+    await server.wait_for_termination()
+
 if __name__ == "__main__":
     import sys
-    serve(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    serve(sys.argv[1], sys.argv[2], *sys.argv[3:5])
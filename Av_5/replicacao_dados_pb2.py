@@ -24,29 +24,51 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16replicacao_dados.proto\x12\x10replicacao_dados\"6\n\x04\x44\x61ta\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"\x16\n\x03\x41\x63k\x12\x0f\n\x07message\x18\x01 \x01(\t\",\n\x0b\x43ommitOrder\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\"\x1e\n\x0cQueryRequest\x12\x0e\n\x06offset\x18\x01 \x01(\x05\"?\n\rQueryResponse\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"/\n\x0eSyncLogRequest\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\":\n\x0fSyncLogResponse\x12\'\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x16.replicacao_dados.Data2\xaf\x02\n\rLeaderService\x12<\n\x0bReceiveData\x12\x16.replicacao_dados.Data\x1a\x15.replicacao_dados.Ack\x12\x42\n\nCommitData\x12\x1d.replicacao_dados.CommitOrder\x1a\x15.replicacao_dados.Ack\x12L\n\tQueryData\x12\x1e.replicacao_dados.QueryRequest\x1a\x1f.replicacao_dados.QueryResponse\x12N\n\x07SyncLog\x12 .replicacao_dados.SyncLogRequest\x1a!.replicacao_dados.SyncLogResponse2\x9c\x01\n\x0eReplicaService\x12\x46\n\x15ReceiveDataFromLeader\x12\x16.replicacao_dados.Data\x1a\x15.replicacao_dados.Ack\x12\x42\n\nCommitData\x12\x1d.replicacao_dados.CommitOrder\x1a\x15.replicacao_dados.Ackb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16replicacao_dados.proto\x12\x10replicacao_dados\"6\n\x04\x44\x61ta\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"z\n\x03\x41\x63k\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12-\n\x06status\x18\x03 \x01(\x0e\x32\x1d.replicacao_dados.WriteStatus\x12\r\n\x05\x65poch\x18\x04 \x01(\t\x12\x14\n\x0c\x63ommit_index\x18\x05 \x01(\x05\"4\n\tDataBatch\x12\'\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x16.replicacao_dados.Data\"/\n\x08\x41\x63kBatch\x12#\n\x04\x61\x63ks\x18\x01 \x03(\x0b\x32\x15.replicacao_dados.Ack\",\n\x0b\x43ommitOrder\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\"8\n\x0cQueryRequest\x12\x0e\n\x06offset\x18\x01 \x01(\x05\x12\x18\n\x10min_commit_index\x18\x02 \x01(\x05\"U\n\rQueryResponse\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x14\n\x0c\x63ommit_index\x18\x04 \x01(\x05\"U\n\x11QueryRangeRequest\x12\x13\n\x0b\x66rom_offset\x18\x01 \x01(\x05\x12\x11\n\tto_offset\x18\x02 \x01(\x05\x12\x18\n\x10min_commit_index\x18\x03 \x01(\x05\">\n\x11QueryBatchRequest\x12\x0f\n\x07offsets\x18\x01 \x03(\x05\x12\x18\n\x10min_commit_index\x18\x02 \x01(\x05\"\\\n\x12QueryBatchResponse\x12\x30\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x1f.replicacao_dados.QueryResponse\x12\x14\n\x0c\x63ommit_index\x18\x02 \x01(\x05\"/\n\x0eSyncLogRequest\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x05\":\n\x0fSyncLogResponse\x12\'\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x16.replicacao_dados.Data\"\xa1\x01\n\x14\x41ppendEntriesRequest\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x13\n\x0bprev_offset\x18\x02 \x01(\x05\x12\x12\n\nprev_epoch\x18\x03 \x01(\t\x12\'\n\x07\x65ntries\x18\x04 \x03(\x0b\x32\x16.replicacao_dados.Data\x12\x15\n\rleader_commit\x18\x05 \x01(\x05\x12\x11\n\tleader_id\x18\x06 \x01(\t\"\x85\x01\n\rSnapshotChunk\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x1c\n\x14last_included_offset\x18\x02 \x01(\x05\x12\x1b\n\x13last_included_epoch\x18\x03 \x01(\t\x12\x0e\n\x06offset\x18\x04 \x01(\x03\x12\x0c\n\x04\x64\x61ta\x18\x05 \x01(\x0c\x12\x0c\n\x04\x64one\x18\x06 \x01(\x08\"~\n\x15\x41ppendEntriesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x14\n\x0cmatch_offset\x18\x02 \x01(\x05\x12\r\n\x05\x65poch\x18\x03 \x01(\t\x12\x16\n\x0e\x63onflict_epoch\x18\x04 \x01(\t\x12\x17\n\x0f\x63onflict_offset\x18\x05 \x01(\x05\"m\n\x0bVoteRequest\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x14\n\x0c\x63\x61ndidate_id\x18\x02 \x01(\t\x12\x13\n\x0blast_offset\x18\x03 \x01(\x05\x12\x12\n\nlast_epoch\x18\x04 \x01(\t\x12\x10\n\x08pre_vote\x18\x05 \x01(\x08\".\n\x0cVoteResponse\x12\r\n\x05\x65poch\x18\x01 \x01(\t\x12\x0f\n\x07granted\x18\x02 \x01(\x08*q\n\x0bWriteStatus\x12\x1c\n\x18WRITE_STATUS_UNSPECIFIED\x10\x00\x12\r\n\tCOMMITTED\x10\x01\x12\x11\n\rQUORUM_FAILED\x10\x02\x12\x12\n\x0eSTORAGE_FAILED\x10\x03\x12\x0e\n\nNOT_LEADER\x10\x04\x32\x88\x05\n\rLeaderService\x12<\n\x0bReceiveData\x12\x16.replicacao_dados.Data\x1a\x15.replicacao_dados.Ack\x12K\n\x10ReceiveDataBatch\x12\x1b.replicacao_dados.DataBatch\x1a\x1a.replicacao_dados.AckBatch\x12\x42\n\nCommitData\x12\x1d.replicacao_dados.CommitOrder\x1a\x15.replicacao_dados.Ack\x12L\n\tQueryData\x12\x1e.replicacao_dados.QueryRequest\x1a\x1f.replicacao_dados.QueryResponse\x12Y\n\nQueryRange\x12#.replicacao_dados.QueryRangeRequest\x1a$.replicacao_dados.QueryBatchResponse0\x01\x12W\n\nQueryBatch\x12#.replicacao_dados.QueryBatchRequest\x1a$.replicacao_dados.QueryBatchResponse\x12N\n\x07SyncLog\x12 .replicacao_dados.SyncLogRequest\x1a!.replicacao_dados.SyncLogResponse\x12V\n\rStreamSyncLog\x12 .replicacao_dados.SyncLogRequest\x1a!.replicacao_dados.SyncLogResponse0\x01\x32\xad\x05\n\x0eReplicaService\x12\x46\n\x15ReceiveDataFromLeader\x12\x16.replicacao_dados.Data\x1a\x15.replicacao_dados.Ack\x12`\n\rAppendEntries\x12&.replicacao_dados.AppendEntriesRequest\x1a\'.replicacao_dados.AppendEntriesResponse\x12]\n\x0fInstallSnapshot\x12\x1f.replicacao_dados.SnapshotChunk\x1a\'.replicacao_dados.AppendEntriesResponse(\x01\x12L\n\x0bRequestVote\x12\x1d.replicacao_dados.VoteRequest\x1a\x1e.replicacao_dados.VoteResponse\x12\x42\n\nCommitData\x12\x1d.replicacao_dados.CommitOrder\x1a\x15.replicacao_dados.Ack\x12L\n\tQueryData\x12\x1e.replicacao_dados.QueryRequest\x1a\x1f.replicacao_dados.QueryResponse\x12Y\n\nQueryRange\x12#.replicacao_dados.QueryRangeRequest\x1a$.replicacao_dados.QueryBatchResponse0\x01\x12W\n\nQueryBatch\x12#.replicacao_dados.QueryBatchRequest\x1a$.replicacao_dados.QueryBatchResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'replicacao_dados_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_WRITESTATUS']._serialized_start=1459
+  _globals['_WRITESTATUS']._serialized_end=1572
   _globals['_DATA']._serialized_start=44
   _globals['_DATA']._serialized_end=98
   _globals['_ACK']._serialized_start=100
-  _globals['_ACK']._serialized_end=122
-  _globals['_COMMITORDER']._serialized_start=124
-  _globals['_COMMITORDER']._serialized_end=168
-  _globals['_QUERYREQUEST']._serialized_start=170
-  _globals['_QUERYREQUEST']._serialized_end=200
-  _globals['_QUERYRESPONSE']._serialized_start=202
-  _globals['_QUERYRESPONSE']._serialized_end=265
-  _globals['_SYNCLOGREQUEST']._serialized_start=267
-  _globals['_SYNCLOGREQUEST']._serialized_end=314
-  _globals['_SYNCLOGRESPONSE']._serialized_start=316
-  _globals['_SYNCLOGRESPONSE']._serialized_end=374
-  _globals['_LEADERSERVICE']._serialized_start=377
-  _globals['_LEADERSERVICE']._serialized_end=680
-  _globals['_REPLICASERVICE']._serialized_start=683
-  _globals['_REPLICASERVICE']._serialized_end=839
+  _globals['_ACK']._serialized_end=222
+  _globals['_DATABATCH']._serialized_start=224
+  _globals['_DATABATCH']._serialized_end=276
+  _globals['_ACKBATCH']._serialized_start=278
+  _globals['_ACKBATCH']._serialized_end=325
+  _globals['_COMMITORDER']._serialized_start=327
+  _globals['_COMMITORDER']._serialized_end=371
+  _globals['_QUERYREQUEST']._serialized_start=373
+  _globals['_QUERYREQUEST']._serialized_end=429
+  _globals['_QUERYRESPONSE']._serialized_start=431
+  _globals['_QUERYRESPONSE']._serialized_end=516
+  _globals['_QUERYRANGEREQUEST']._serialized_start=518
+  _globals['_QUERYRANGEREQUEST']._serialized_end=603
+  _globals['_QUERYBATCHREQUEST']._serialized_start=605
+  _globals['_QUERYBATCHREQUEST']._serialized_end=667
+  _globals['_QUERYBATCHRESPONSE']._serialized_start=669
+  _globals['_QUERYBATCHRESPONSE']._serialized_end=761
+  _globals['_SYNCLOGREQUEST']._serialized_start=763
+  _globals['_SYNCLOGREQUEST']._serialized_end=810
+  _globals['_SYNCLOGRESPONSE']._serialized_start=812
+  _globals['_SYNCLOGRESPONSE']._serialized_end=870
+  _globals['_APPENDENTRIESREQUEST']._serialized_start=873
+  _globals['_APPENDENTRIESREQUEST']._serialized_end=1034
+  _globals['_SNAPSHOTCHUNK']._serialized_start=1037
+  _globals['_SNAPSHOTCHUNK']._serialized_end=1170
+  _globals['_APPENDENTRIESRESPONSE']._serialized_start=1172
+  _globals['_APPENDENTRIESRESPONSE']._serialized_end=1298
+  _globals['_VOTEREQUEST']._serialized_start=1300
+  _globals['_VOTEREQUEST']._serialized_end=1409
+  _globals['_VOTERESPONSE']._serialized_start=1411
+  _globals['_VOTERESPONSE']._serialized_end=1457
+  _globals['_LEADERSERVICE']._serialized_start=1575
+  _globals['_LEADERSERVICE']._serialized_end=2223
+  _globals['_REPLICASERVICE']._serialized_start=2226
+  _globals['_REPLICASERVICE']._serialized_end=2911
 # @@protoc_insertion_point(module_scope)
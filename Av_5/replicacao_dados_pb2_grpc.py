@@ -39,6 +39,11 @@ class LeaderServiceStub(object):
                 request_serializer=replicacao__dados__pb2.Data.SerializeToString,
                 response_deserializer=replicacao__dados__pb2.Ack.FromString,
                 _registered_method=True)
+        self.ReceiveDataBatch = channel.unary_unary(
+                '/replicacao_dados.LeaderService/ReceiveDataBatch',
+                request_serializer=replicacao__dados__pb2.DataBatch.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.AckBatch.FromString,
+                _registered_method=True)
         self.CommitData = channel.unary_unary(
                 '/replicacao_dados.LeaderService/CommitData',
                 request_serializer=replicacao__dados__pb2.CommitOrder.SerializeToString,
@@ -49,11 +54,26 @@ class LeaderServiceStub(object):
                 request_serializer=replicacao__dados__pb2.QueryRequest.SerializeToString,
                 response_deserializer=replicacao__dados__pb2.QueryResponse.FromString,
                 _registered_method=True)
+        self.QueryRange = channel.unary_stream(
+                '/replicacao_dados.LeaderService/QueryRange',
+                request_serializer=replicacao__dados__pb2.QueryRangeRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.QueryBatchResponse.FromString,
+                _registered_method=True)
+        self.QueryBatch = channel.unary_unary(
+                '/replicacao_dados.LeaderService/QueryBatch',
+                request_serializer=replicacao__dados__pb2.QueryBatchRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.QueryBatchResponse.FromString,
+                _registered_method=True)
         self.SyncLog = channel.unary_unary(
                 '/replicacao_dados.LeaderService/SyncLog',
                 request_serializer=replicacao__dados__pb2.SyncLogRequest.SerializeToString,
                 response_deserializer=replicacao__dados__pb2.SyncLogResponse.FromString,
                 _registered_method=True)
+        self.StreamSyncLog = channel.unary_stream(
+                '/replicacao_dados.LeaderService/StreamSyncLog',
+                request_serializer=replicacao__dados__pb2.SyncLogRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.SyncLogResponse.FromString,
+                _registered_method=True)
 
 
 class LeaderServiceServicer(object):
@@ -65,6 +85,12 @@ class LeaderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ReceiveDataBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CommitData(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -77,12 +103,30 @@ class LeaderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def QueryRange(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SyncLog(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamSyncLog(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_LeaderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -91,6 +135,11 @@ def add_LeaderServiceServicer_to_server(servicer, server):
                     request_deserializer=replicacao__dados__pb2.Data.FromString,
                     response_serializer=replicacao__dados__pb2.Ack.SerializeToString,
             ),
+            'ReceiveDataBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReceiveDataBatch,
+                    request_deserializer=replicacao__dados__pb2.DataBatch.FromString,
+                    response_serializer=replicacao__dados__pb2.AckBatch.SerializeToString,
+            ),
             'CommitData': grpc.unary_unary_rpc_method_handler(
                     servicer.CommitData,
                     request_deserializer=replicacao__dados__pb2.CommitOrder.FromString,
@@ -101,11 +150,26 @@ def add_LeaderServiceServicer_to_server(servicer, server):
                     request_deserializer=replicacao__dados__pb2.QueryRequest.FromString,
                     response_serializer=replicacao__dados__pb2.QueryResponse.SerializeToString,
             ),
+            'QueryRange': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryRange,
+                    request_deserializer=replicacao__dados__pb2.QueryRangeRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.QueryBatchResponse.SerializeToString,
+            ),
+            'QueryBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.QueryBatch,
+                    request_deserializer=replicacao__dados__pb2.QueryBatchRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.QueryBatchResponse.SerializeToString,
+            ),
             'SyncLog': grpc.unary_unary_rpc_method_handler(
                     servicer.SyncLog,
                     request_deserializer=replicacao__dados__pb2.SyncLogRequest.FromString,
                     response_serializer=replicacao__dados__pb2.SyncLogResponse.SerializeToString,
             ),
+            'StreamSyncLog': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamSyncLog,
+                    request_deserializer=replicacao__dados__pb2.SyncLogRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.SyncLogResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'replicacao_dados.LeaderService', rpc_method_handlers)
@@ -144,6 +208,33 @@ class LeaderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ReceiveDataBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.LeaderService/ReceiveDataBatch',
+            replicacao__dados__pb2.DataBatch.SerializeToString,
+            replicacao__dados__pb2.AckBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CommitData(request,
             target,
@@ -198,6 +289,60 @@ class LeaderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def QueryRange(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/replicacao_dados.LeaderService/QueryRange',
+            replicacao__dados__pb2.QueryRangeRequest.SerializeToString,
+            replicacao__dados__pb2.QueryBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.LeaderService/QueryBatch',
+            replicacao__dados__pb2.QueryBatchRequest.SerializeToString,
+            replicacao__dados__pb2.QueryBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SyncLog(request,
             target,
@@ -225,6 +370,33 @@ class LeaderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamSyncLog(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/replicacao_dados.LeaderService/StreamSyncLog',
+            replicacao__dados__pb2.SyncLogRequest.SerializeToString,
+            replicacao__dados__pb2.SyncLogResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class ReplicaServiceStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -240,11 +412,41 @@ class ReplicaServiceStub(object):
                 request_serializer=replicacao__dados__pb2.Data.SerializeToString,
                 response_deserializer=replicacao__dados__pb2.Ack.FromString,
                 _registered_method=True)
+        self.AppendEntries = channel.unary_unary(
+                '/replicacao_dados.ReplicaService/AppendEntries',
+                request_serializer=replicacao__dados__pb2.AppendEntriesRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.AppendEntriesResponse.FromString,
+                _registered_method=True)
+        self.InstallSnapshot = channel.stream_unary(
+                '/replicacao_dados.ReplicaService/InstallSnapshot',
+                request_serializer=replicacao__dados__pb2.SnapshotChunk.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.AppendEntriesResponse.FromString,
+                _registered_method=True)
+        self.RequestVote = channel.unary_unary(
+                '/replicacao_dados.ReplicaService/RequestVote',
+                request_serializer=replicacao__dados__pb2.VoteRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.VoteResponse.FromString,
+                _registered_method=True)
         self.CommitData = channel.unary_unary(
                 '/replicacao_dados.ReplicaService/CommitData',
                 request_serializer=replicacao__dados__pb2.CommitOrder.SerializeToString,
                 response_deserializer=replicacao__dados__pb2.Ack.FromString,
                 _registered_method=True)
+        self.QueryData = channel.unary_unary(
+                '/replicacao_dados.ReplicaService/QueryData',
+                request_serializer=replicacao__dados__pb2.QueryRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.QueryResponse.FromString,
+                _registered_method=True)
+        self.QueryRange = channel.unary_stream(
+                '/replicacao_dados.ReplicaService/QueryRange',
+                request_serializer=replicacao__dados__pb2.QueryRangeRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.QueryBatchResponse.FromString,
+                _registered_method=True)
+        self.QueryBatch = channel.unary_unary(
+                '/replicacao_dados.ReplicaService/QueryBatch',
+                request_serializer=replicacao__dados__pb2.QueryBatchRequest.SerializeToString,
+                response_deserializer=replicacao__dados__pb2.QueryBatchResponse.FromString,
+                _registered_method=True)
 
 
 class ReplicaServiceServicer(object):
@@ -256,12 +458,48 @@ class ReplicaServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AppendEntries(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def InstallSnapshot(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RequestVote(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CommitData(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def QueryData(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryRange(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ReplicaServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -270,11 +508,41 @@ def add_ReplicaServiceServicer_to_server(servicer, server):
                     request_deserializer=replicacao__dados__pb2.Data.FromString,
                     response_serializer=replicacao__dados__pb2.Ack.SerializeToString,
             ),
+            'AppendEntries': grpc.unary_unary_rpc_method_handler(
+                    servicer.AppendEntries,
+                    request_deserializer=replicacao__dados__pb2.AppendEntriesRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.AppendEntriesResponse.SerializeToString,
+            ),
+            'InstallSnapshot': grpc.stream_unary_rpc_method_handler(
+                    servicer.InstallSnapshot,
+                    request_deserializer=replicacao__dados__pb2.SnapshotChunk.FromString,
+                    response_serializer=replicacao__dados__pb2.AppendEntriesResponse.SerializeToString,
+            ),
+            'RequestVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.RequestVote,
+                    request_deserializer=replicacao__dados__pb2.VoteRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.VoteResponse.SerializeToString,
+            ),
             'CommitData': grpc.unary_unary_rpc_method_handler(
                     servicer.CommitData,
                     request_deserializer=replicacao__dados__pb2.CommitOrder.FromString,
                     response_serializer=replicacao__dados__pb2.Ack.SerializeToString,
             ),
+            'QueryData': grpc.unary_unary_rpc_method_handler(
+                    servicer.QueryData,
+                    request_deserializer=replicacao__dados__pb2.QueryRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.QueryResponse.SerializeToString,
+            ),
+            'QueryRange': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryRange,
+                    request_deserializer=replicacao__dados__pb2.QueryRangeRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.QueryBatchResponse.SerializeToString,
+            ),
+            'QueryBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.QueryBatch,
+                    request_deserializer=replicacao__dados__pb2.QueryBatchRequest.FromString,
+                    response_serializer=replicacao__dados__pb2.QueryBatchResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'replicacao_dados.ReplicaService', rpc_method_handlers)
@@ -313,6 +581,87 @@ class ReplicaService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AppendEntries(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.ReplicaService/AppendEntries',
+            replicacao__dados__pb2.AppendEntriesRequest.SerializeToString,
+            replicacao__dados__pb2.AppendEntriesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def InstallSnapshot(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/replicacao_dados.ReplicaService/InstallSnapshot',
+            replicacao__dados__pb2.SnapshotChunk.SerializeToString,
+            replicacao__dados__pb2.AppendEntriesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RequestVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.ReplicaService/RequestVote',
+            replicacao__dados__pb2.VoteRequest.SerializeToString,
+            replicacao__dados__pb2.VoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CommitData(request,
             target,
@@ -339,3 +688,84 @@ class ReplicaService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def QueryData(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.ReplicaService/QueryData',
+            replicacao__dados__pb2.QueryRequest.SerializeToString,
+            replicacao__dados__pb2.QueryResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryRange(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/replicacao_dados.ReplicaService/QueryRange',
+            replicacao__dados__pb2.QueryRangeRequest.SerializeToString,
+            replicacao__dados__pb2.QueryBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replicacao_dados.ReplicaService/QueryBatch',
+            replicacao__dados__pb2.QueryBatchRequest.SerializeToString,
+            replicacao__dados__pb2.QueryBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
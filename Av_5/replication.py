@@ -0,0 +1,291 @@
+import time
+from threading import Condition, Thread
+import replicacao_dados_pb2 as pb2
+from cluster import epoch_number
+
+# Quantidade máxima de offsets enviados e ainda não confirmados por réplica
+REPLICATION_WINDOW = 32
+# Limites de cada lote do AppendEntries: número de entradas, bytes e espera (s)
+BATCH_MAX_ENTRIES = 256
+BATCH_MAX_BYTES = 1024 * 1024
+BATCH_LINGER = 0.002
+# Intervalo (s) do AppendEntries vazio enviado quando não há novas entradas;
+# precisa ficar bem abaixo do tempo de eleição das réplicas
+HEARTBEAT_INTERVAL = 0.05
+# Tempo máximo (s) que cada réplica tem para responder a uma propagação
+REPLICA_TIMEOUT = 2.0
+# Espera (s) antes de retransmitir depois de uma falha
+RETRY_BACKOFF = 0.2
+# Tempo máximo (s) para transferir um snapshot inteiro
+SNAPSHOT_TIMEOUT = 60.0
+
+class ReplicationPipeline:
+    # Envia à réplica um fluxo ordenado de lotes de entradas, mantendo até
+    # `window` offsets em trânsito. next_index/match_index seguem a ideia do Raft.
+    # O índice de commit do líder vai junto de cada lote ou heartbeat.
+    def __init__(self, addr, stub, epoch, get_entry, on_match, window=REPLICATION_WINDOW,
+                 max_entries=BATCH_MAX_ENTRIES, max_bytes=BATCH_MAX_BYTES, linger=BATCH_LINGER, snapshots=None,
+                 last_offset=-1, leader_id="", on_higher_epoch=None, find_epoch_end=None, is_connected=None):
+        self.addr = addr
+        self.stub = stub
+        self.epoch = epoch
+        self.get_entry = get_entry
+        self.on_match = on_match
+        self.window = window
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.snapshots = snapshots
+        self.leader_id = leader_id
+        # Chamado quando a réplica responde com uma epoch maior: outro líder foi eleito
+        self.on_higher_epoch = on_higher_epoch
+        # Último offset de uma epoch no log do líder (ou None); usado para pular conflitos de uma vez
+        self.find_epoch_end = find_epoch_end
+        # Se o canal com a réplica está conectado; cada envio de snapshot copia o banco final inteiro,
+        # então ele só começa com a réplica no ar
+        self.is_connected = is_connected or (lambda: True)
+        self.cond = Condition()
+        # Como no Raft, começa supondo que a réplica tem o log inteiro; a checagem de consistência corrige
+        self.next_index = last_offset + 1
+        self.match_index = -1
+        self.last_offset = last_offset
+        self.leader_commit = -1
+        self.sent_commit = -1
+        # seq -> (primeiro offset, último offset, instante do envio)
+        self.in_flight = {}
+        # Envio mais recente que a réplica já respondeu nesta epoch; base do lease do líder
+        self.acked_at = float("-inf")
+        self.batch_seq = 0
+        self.pending_commits = []
+        self.ready_since = None
+        self.last_sent = 0
+        self.retry_at = 0
+        self.active = True
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def append(self, offset):
+        with self.cond:
+            self.last_offset = max(self.last_offset, offset)
+            self.cond.notify_all()
+
+    def set_commit(self, commit_index):
+        with self.cond:
+            self.leader_commit = max(self.leader_commit, commit_index)
+            self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            self.active = False
+            self.cond.notify_all()
+
+    def in_flight_count(self):
+        return sum(last - first + 1 for first, last, _ in self.in_flight.values())
+
+    def available(self):
+        return min(self.last_offset - self.next_index + 1, self.window - self.in_flight_count())
+
+    def wait_timeout(self):
+        now = time.time()
+        if now < self.retry_at:
+            return self.retry_at - now
+        if self.ready_since is not None and self.available() > 0:
+            return max(self.ready_since + self.linger - now, 0)
+        if self.in_flight:
+            # As respostas pendentes acordam a thread
+            return None
+        return max(self.last_sent + HEARTBEAT_INTERVAL - now, 0)
+
+    def batch_ready(self):
+        available = self.available()
+        if available <= 0:
+            return False
+        # Agrupa as escritas até encher o lote ou o tempo de espera acabar
+        if self.ready_since is None:
+            self.ready_since = time.time()
+        return available >= self.max_entries or time.time() >= self.ready_since + self.linger
+
+    def heartbeat_due(self):
+        # Sem entradas novas: avisa o commit pendente ou mantém o contato periódico
+        if self.in_flight or self.next_index <= self.last_offset:
+            return False
+        return self.leader_commit > self.sent_commit or time.time() >= self.last_sent + HEARTBEAT_INTERVAL
+
+    def snapshot_due(self):
+        # As entradas que a réplica precisa já foram compactadas: só o snapshot resolve
+        return (self.snapshots is not None and not self.in_flight and time.time() >= self.retry_at
+                and self.next_index <= self.snapshots.compacted_offset and self.is_connected())
+
+    def next_request(self):
+        if time.time() < self.retry_at:
+            return None
+        if self.batch_ready():
+            return self.build_request(self.next_index, min(self.available(), self.max_entries))
+        if self.heartbeat_due():
+            return self.build_request(self.next_index, 0)
+        return None
+
+    def run(self):
+        # Um erro ao montar ou enviar um lote não pode encerrar a thread: sem ela a réplica
+        # para de receber entradas e o líder talvez nunca mais alcance o quórum
+        while self.active:
+            try:
+                self.send_next()
+            except Exception as e:
+                print(f"[LÍDER] Erro no pipeline de {self.addr}: {e!r}; tentando de novo")
+                with self.cond:
+                    self.retry_at = time.time() + RETRY_BACKOFF
+
+    def send_next(self):
+        # Espera o próximo lote, heartbeat ou snapshot e o envia
+        with self.cond:
+            request = None
+            install = False
+            while self.active and request is None and not install:
+                install = self.snapshot_due()
+                if not install:
+                    request = self.next_request()
+                if request is None and not install:
+                    self.cond.wait(timeout=self.wait_timeout())
+            if not self.active:
+                return
+            if install:
+                self.last_sent = time.time()
+        if install:
+            self.install_snapshot()
+            return
+
+        with self.cond:
+            first = request.prev_offset + 1
+            last = first + len(request.entries) - 1
+            self.next_index = last + 1
+            self.batch_seq += 1
+            seq = self.batch_seq
+            self.in_flight[seq] = (first, last, time.monotonic())
+            self.ready_since = None
+            self.sent_commit = request.leader_commit
+            self.last_sent = time.time()
+
+        try:
+            future = self.stub.AppendEntries.future(request, timeout=REPLICA_TIMEOUT)
+        except Exception:
+            # O lote não saiu: libera a janela e reenvia a partir dele
+            with self.cond:
+                del self.in_flight[seq]
+                self.next_index = min(self.next_index, first)
+            raise
+        future.add_done_callback(lambda f, seq=seq: self.on_response(seq, f))
+
+    def build_request(self, first, count):
+        entries = []
+        size = 0
+        for offset in range(first, first + count):
+            entry = self.get_entry(offset)
+            if entries and size + entry.ByteSize() > self.max_bytes:
+                break
+            entries.append(entry)
+            size += entry.ByteSize()
+        prev_epoch = self.get_entry(first - 1).epoch if first > 0 else ""
+        return pb2.AppendEntriesRequest(epoch=self.epoch, prev_offset=first - 1, prev_epoch=prev_epoch,
+                                        entries=entries, leader_commit=self.leader_commit, leader_id=self.leader_id)
+
+    def install_snapshot(self):
+        print(f"[LÍDER] Enviando snapshot para {self.addr}")
+        try:
+            resp = self.stub.InstallSnapshot(self.snapshots.iter_chunks(self.epoch), timeout=SNAPSHOT_TIMEOUT)
+        except Exception as e:
+            print(f"[LÍDER] Falha ao enviar snapshot para {self.addr}: {e}")
+            with self.cond:
+                self.retry_at = time.time() + RETRY_BACKOFF
+            return
+        if self.stale(resp):
+            return
+
+        with self.cond:
+            self.match_index = max(self.match_index, resp.match_offset)
+            self.next_index = max(self.next_index, resp.match_offset + 1)
+            match_index = self.match_index
+            self.cond.notify_all()
+        self.on_match(self.addr, match_index)
+
+    def on_response(self, seq, future):
+        first, last, sent_at = self.in_flight[seq]
+        try:
+            resp = future.result()
+            ok = resp.success
+        except Exception as e:
+            print(f"[LÍDER] Falha ao propagar offsets {first}-{last} para {self.addr}: {e}")
+            resp = None
+            ok = False
+        if self.stale(resp):
+            return
+
+        with self.cond:
+            del self.in_flight[seq]
+            if resp is not None:
+                # Qualquer resposta nesta epoch mostra que a réplica aceitou este líder ao receber o lote
+                self.acked_at = max(self.acked_at, sent_at)
+            if ok:
+                # A checagem de consistência garante que a réplica tem tudo até match_offset; se ela
+                # alcançou o líder pelo StreamSyncLog, o próximo lote já parte dali
+                self.match_index = max(self.match_index, resp.match_offset)
+                self.next_index = max(self.next_index, min(self.match_index, self.last_offset) + 1)
+            elif resp is not None:
+                # A réplica rejeitou a checagem de consistência: reenvia a partir do primeiro ponto que pode divergir
+                self.next_index = min(self.next_index, first, self.repair_index(resp))
+                self.match_index = min(self.match_index, resp.match_offset)
+            else:
+                # Volta o next_index para a primeira entrada não confirmada
+                self.next_index = min(self.next_index, first)
+                self.sent_commit = min(self.sent_commit, self.match_index)
+                self.retry_at = time.time() + RETRY_BACKOFF
+            match_index = self.match_index
+            commits = self.take_ready_commits()
+            self.cond.notify_all()
+
+        self.send_commits(commits)
+        if ok:
+            self.on_match(self.addr, match_index)
+
+    def repair_index(self, resp):
+        # Como no Raft: se o líder também tem a epoch conflitante, o log confere até a última entrada
+        # dela; senão toda a epoch da réplica é descartada. Uma rejeição por epoch, não por offset.
+        if resp.conflict_epoch and self.find_epoch_end is not None:
+            last = self.find_epoch_end(resp.conflict_epoch)
+            if last is not None:
+                return last + 1
+        return resp.match_offset + 1
+
+    def stale(self, resp):
+        # Uma epoch maior na resposta significa que este líder foi deposto: para de replicar
+        if resp is None or epoch_number(resp.epoch) <= epoch_number(self.epoch):
+            return False
+        with self.cond:
+            was_active = self.active
+        self.stop()
+        if was_active and self.on_higher_epoch:
+            self.on_higher_epoch(resp.epoch)
+        return True
+
+    def commit(self, order):
+        # CommitData por offset (opcional): só é enviado depois que a réplica confirmar a entrada
+        with self.cond:
+            self.pending_commits.append(order)
+            commits = self.take_ready_commits()
+        self.send_commits(commits)
+
+    def take_ready_commits(self):
+        ready = [o for o in self.pending_commits if o.offset <= self.match_index]
+        self.pending_commits = [o for o in self.pending_commits if o.offset > self.match_index]
+        return ready
+
+    def send_commits(self, orders):
+        for order in orders:
+            future = self.stub.CommitData.future(order, timeout=REPLICA_TIMEOUT)
+            future.add_done_callback(lambda f, order=order: self.on_commit_response(order, f))
+
+    def on_commit_response(self, order, future):
+        if future.exception() is not None:
+            print(f"[LÍDER] Falha ao enviar commit do offset {order.offset} a {self.addr}: {future.exception()}")
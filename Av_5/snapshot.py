@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import tempfile
+from threading import Lock, Thread
+import replicacao_dados_pb2 as pb2
+from database import COMPACT_SQL, MIN_OFFSET_SQL, fetch_last_entry, open_read_only
+
+# Quantidade de entradas commitadas entre uma compactação do log intermediário e a próxima
+SNAPSHOT_THRESHOLD = 10000
+# Entradas mantidas no log intermediário depois da compactação, para réplicas pouco atrasadas
+SNAPSHOT_TRAILING_ENTRIES = 1000
+# Tamanho (bytes) de cada bloco do arquivo enviado pelo InstallSnapshot
+SNAPSHOT_CHUNK_SIZE = 64 * 1024
+# Sufixo das cópias do banco final feitas para um envio do InstallSnapshot
+SEND_SUFFIX = ".send"
+
+class SnapshotStore:
+    # O banco final já é o estado commitado, então compactar o log intermediário não exige cópia:
+    # o prefixo commitado é simplesmente removido dele. Só quando uma réplica precisa de entradas
+    # compactadas o líder copia o banco final e transmite a cópia, que é apagada depois do envio.
+    # `path` é a base dos nomes dos arquivos temporários de envio e de recebimento.
+    def __init__(self, path, db_final, db_intermediario, threshold=SNAPSHOT_THRESHOLD,
+                 trailing=SNAPSHOT_TRAILING_ENTRIES):
+        self.path = path
+        self.db_final = db_final
+        self.db_intermediario = db_intermediario
+        self.threshold = threshold
+        self.trailing = trailing
+        self.lock = Lock()
+        self.running = False
+        self.compacted_offset = -1
+        self.recover()
+
+    def recover(self):
+        # Arquivos de um envio ou recebimento interrompido pela queda são descartados
+        folder, prefix = os.path.split(os.path.abspath(self.path))
+        for name in os.listdir(folder):
+            if name == prefix + ".part" or (name.startswith(prefix + ".") and name.endswith(SEND_SUFFIX)):
+                os.remove(os.path.join(folder, name))
+        # O prefixo compactado termina logo antes da primeira entrada que sobrou no log intermediário;
+        # sem nenhuma, tudo o que existe está commitado no banco final
+        first = self.db_intermediario.cursor().execute(MIN_OFFSET_SQL).fetchone()[0]
+        if first is not None:
+            self.compacted_offset = first - 1
+        else:
+            last = fetch_last_entry(self.db_final)
+            self.compacted_offset = last[1] if last is not None else -1
+
+    def maybe_compact(self, commit_index):
+        with self.lock:
+            if self.running or commit_index - self.trailing - self.compacted_offset < self.threshold:
+                return
+            self.running = True
+        Thread(target=self.compact_in_background, args=(commit_index - self.trailing,), daemon=True).start()
+
+    def compact_in_background(self, offset):
+        try:
+            self.compact(offset)
+        except Exception as e:
+            print(f"[SNAPSHOT] Falha ao compactar o log intermediário: {e}")
+        finally:
+            with self.lock:
+                self.running = False
+
+    def copy_final(self, path):
+        # Com WAL a conexão de leitura vê uma versão consistente do banco final durante toda a cópia,
+        # e os commits continuam pela conexão compartilhada enquanto isso. Devolve a última (epoch, offset).
+        target = sqlite3.connect(path)
+        source = open_read_only(self.db_final)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+        try:
+            target.execute("PRAGMA journal_mode = DELETE")
+            return target.execute("SELECT epoch, offset FROM log ORDER BY offset DESC LIMIT 1").fetchone()
+        finally:
+            target.close()
+
+    def compact(self, offset):
+        # Remove do log intermediário o prefixo já coberto pelo snapshot
+        if offset <= self.compacted_offset:
+            return
+        with self.db_intermediario.lock:
+            cursor = self.db_intermediario.cursor()
+            cursor.execute(COMPACT_SQL, (offset,))
+            self.db_intermediario.commit()
+        self.compacted_offset = offset
+        print(f"[SNAPSHOT] Log intermediário compactado até o offset {offset}")
+
+    def iter_chunks(self, epoch):
+        # Copia o banco final e transmite a cópia em blocos; ela cobre tudo o que foi compactado
+        fd, send_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                         prefix=os.path.basename(self.path) + ".", suffix=SEND_SUFFIX)
+        os.close(fd)
+        try:
+            last = self.copy_final(send_path)
+            if last is None:
+                raise RuntimeError("banco final vazio")
+            last_included_epoch, last_included_offset = last
+            with open(send_path, "rb") as snapshot_file:
+                position = 0
+                while True:
+                    data = snapshot_file.read(SNAPSHOT_CHUNK_SIZE)
+                    yield pb2.SnapshotChunk(epoch=epoch, last_included_offset=last_included_offset,
+                                            last_included_epoch=last_included_epoch, offset=position,
+                                            data=data, done=not data)
+                    if not data:
+                        return
+                    position += len(data)
+        finally:
+            os.remove(send_path)
+
+    def install(self, chunks):
+        # Grava os blocos num arquivo temporário e só troca o estado quando o último chegar
+        tmp_path = self.path + ".part"
+        last_chunk = None
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.seek(chunk.offset)
+                f.write(chunk.data)
+                last_chunk = chunk
+                if chunk.done:
+                    break
+        if last_chunk is None or not last_chunk.done:
+            os.remove(tmp_path)
+            raise RuntimeError("snapshot incompleto")
+        last_included_offset = last_chunk.last_included_offset
+        last_included_epoch = last_chunk.last_included_epoch
+
+        try:
+            with self.db_final.lock:
+                cursor = self.db_final.cursor()
+                cursor.execute("ATTACH DATABASE ? AS snapshot", (tmp_path,))
+                cursor.execute("DELETE FROM log")
+                cursor.execute("INSERT INTO log SELECT epoch, offset, content FROM snapshot.log")
+                self.db_final.commit()
+                cursor.execute("DETACH DATABASE snapshot")
+        finally:
+            os.remove(tmp_path)
+
+        # Como no Raft: se o log local concorda no último offset do snapshot, mantém o que vem depois
+        with self.db_intermediario.lock:
+            cursor = self.db_intermediario.cursor()
+            cursor.execute("SELECT epoch FROM log WHERE offset = ?", (last_included_offset,))
+            row = cursor.fetchone()
+            if row is None or row[0] != last_included_epoch:
+                cursor.execute("DELETE FROM log")
+            else:
+                cursor.execute(COMPACT_SQL, (last_included_offset,))
+            self.db_intermediario.commit()
+        self.compacted_offset = last_included_offset
+        print(f"[SNAPSHOT] Snapshot instalado até o offset {last_included_offset}")
+        return last_included_offset